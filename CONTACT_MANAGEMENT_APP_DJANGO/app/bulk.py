@@ -0,0 +1,188 @@
+# Bulk import and streaming export of contacts, as CSV or vCard.
+#
+# Import reads the file lazily, validates rows with the model fields' own validation, and
+# writes every CHUNK_SIZE valid rows with one bulk_create inside one transaction, instead
+# of a form round-trip and a save() (and a commit) per contact. bulk_create sends no
+# signals, so each chunk is added to the search index and invalidates the cache explicitly.
+#
+# Export walks the manager's contacts with a database cursor (.iterator()) and yields
+# the file row by row, so memory stays flat however many contacts there are.
+import csv
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contact
+from . import cache, search
+
+CHUNK_SIZE = 1000
+FIELDS = ('name', 'email', 'phone', 'info', 'gender')
+MAX_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        # (row number, message), the first MAX_ERRORS only
+        self.errors = []
+
+    def error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((row, message))
+
+
+def read_csv(lines):
+    # dicts with the FIELDS columns from a CSV file with a header row
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield {field: (record.get(field) or '').strip() for field in FIELDS}
+
+
+def _unfold(lines):
+    # vCard lines continued on the next line start with a space or a tab
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _unescape(value):
+    return re.sub(r'\\([,;\\nN])', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;').replace('\n', '\\n')
+
+
+def read_vcard(lines):
+    # dicts with the FIELDS keys, one per BEGIN:VCARD ... END:VCARD block
+    record = None
+    for line in _unfold(lines):
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        # drop parameters (TEL;TYPE=cell) and groups (item1.EMAIL)
+        key = key.split(';', 1)[0].split('.')[-1].upper()
+        value = _unescape(value.strip())
+        if key == 'BEGIN' and value.upper() == 'VCARD':
+            record = dict.fromkeys(FIELDS, '')
+        elif record is None:
+            continue
+        elif key == 'END':
+            yield record
+            record = None
+        elif key == 'FN':
+            record['name'] = value
+        elif key == 'EMAIL' and not record['email']:
+            record['email'] = value
+        elif key == 'TEL' and not record['phone']:
+            record['phone'] = value
+        elif key == 'NOTE':
+            record['info'] = value
+        elif key == 'GENDER':
+            # vCard 4: M / F
+            record['gender'] = {'M': 'male', 'F': 'female'}.get(value[:1].upper(), value.lower())
+        elif key == 'X-GENDER':
+            record['gender'] = value.lower()
+
+
+def clean_row(record):
+    # field values checked and converted like the create form does, raises ValidationError
+    values = {}
+    errors = []
+    record = dict(record)
+    # phone numbers are stored as integers: +977-980 123 -> 977980123
+    record['phone'] = re.sub(r'[\s\-().+]', '', record['phone'])
+    for name in FIELDS:
+        field = Contact._meta.get_field(name)
+        try:
+            values[name] = field.clean(record[name], None)
+        except ValidationError as e:
+            errors.append('{}: {}'.format(name, ' '.join(e.messages)))
+    if errors:
+        raise ValidationError('; '.join(errors))
+    return values
+
+
+def _write_chunk(manager, contacts):
+    with transaction.atomic():
+        # the insert comes first so the transaction takes the write lock before it reads
+        # anything: sqlite cannot upgrade a read transaction once another writer has committed,
+        # it fails with "database is locked" at once instead of waiting out the busy timeout
+        Contact.objects.bulk_create(contacts)
+        # sqlite does not return the new ids from bulk_create; ids are AUTOINCREMENT and no other
+        # writer can insert while this transaction holds the lock, so they are the highest ones
+        first = Contact.objects.order_by('-id').values_list('id', flat=True)[len(contacts) - 1]
+        search.index_new_contacts(manager.pk, first - 1)
+    transaction.on_commit(lambda: cache.invalidate(manager.pk))
+
+
+def import_contacts(manager, records, chunk_size=CHUNK_SIZE, progress=None):
+    # adds the valid records to manager's contacts; progress(result) is called after every chunk
+    result = ImportResult()
+    chunk = []
+    now = timezone.now()
+    for row, record in enumerate(records, 1):
+        result.rows += 1
+        try:
+            values = clean_row(record)
+        except ValidationError as e:
+            result.error(row, ' '.join(e.messages))
+            continue
+        chunk.append(Contact(manager=manager, date_added=now, **values))
+        if len(chunk) >= chunk_size:
+            _write_chunk(manager, chunk)
+            result.created += len(chunk)
+            chunk = []
+            if progress:
+                progress(result)
+    if chunk:
+        _write_chunk(manager, chunk)
+        result.created += len(chunk)
+    if progress:
+        progress(result)
+    return result
+
+
+def reader_for(filename):
+    # read_vcard for .vcf / .vcard files, read_csv for everything else
+    if filename.lower().endswith(('.vcf', '.vcard')):
+        return read_vcard
+    return read_csv
+
+
+def _contact_rows(manager):
+    return (Contact.objects.filter(manager=manager).order_by('id')
+            .values_list(*FIELDS).iterator(chunk_size=2000))
+
+
+class _Echo:
+    # csv.writer target that hands back the formatted line instead of storing it
+    def write(self, value):
+        return value
+
+
+def export_csv(manager):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in _contact_rows(manager):
+        yield writer.writerow(row)
+
+
+def export_vcard(manager):
+    for name, email, phone, info, gender in _contact_rows(manager):
+        yield ('BEGIN:VCARD\r\nVERSION:3.0\r\nFN:{0}\r\nN:{0};;;;\r\nEMAIL:{1}\r\nTEL:{2}\r\n'
+               'NOTE:{3}\r\nX-GENDER:{4}\r\nEND:VCARD\r\n').format(
+                   _escape(name), _escape(email), phone, _escape(info), gender)
@@ -0,0 +1,63 @@
+# Per-manager cache of contact list pages and contact objects (Django cache framework, see
+# CACHES in contacts/settings.py).
+#
+# Every key carries the manager's current version number. Any change to one of the manager's
+# contacts bumps the version (app/signals.py, and app/bulk.py for imports), which makes all
+# of that manager's cached entries unreachable at once; they then expire on their own. Keys
+# always include the manager id, so one user can never be served another user's contacts.
+import time
+
+from django.core.cache import cache
+
+from .models import Contact
+from .pagination import keyset_page
+
+TIMEOUT = 300
+
+
+def _version_key(manager_id):
+    return 'contacts:{}:version'.format(manager_id)
+
+
+def version(manager_id):
+    key = _version_key(manager_id)
+    value = cache.get(key)
+    if value is None:
+        # a millisecond clock rather than 1, so a version that was evicted is never reused
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate(manager_id):
+    try:
+        cache.incr(_version_key(manager_id))
+    except ValueError:
+        # nothing stored: any new version is newer than the ones cached entries were made with
+        version(manager_id)
+
+
+def _key(manager_id, *parts):
+    return 'contacts:{}:{}:{}'.format(manager_id, version(manager_id), ':'.join(str(p) for p in parts))
+
+
+def contact_page(manager, after=None):
+    # keyset_page() of the manager's contacts, cached; `after` is a decoded cursor, so the key
+    # is built from its values and not from whatever string the client sent
+    key = _key(manager.pk, 'page', '{}|{}'.format(after[0].isoformat(), after[1]) if after else '')
+    page = cache.get(key)
+    if page is None:
+        page = keyset_page(Contact.objects.filter(manager=manager), after)
+        cache.set(key, page, TIMEOUT)
+    return page
+
+
+def contact(manager, pk):
+    # one of the manager's contacts, or None if there is no such contact for this manager
+    key = _key(manager.pk, 'contact', pk)
+    found = cache.get(key)
+    if found is None:
+        found = Contact.objects.filter(manager=manager, pk=pk).first()
+        if found is not None:
+            cache.set(key, found, TIMEOUT)
+    return found
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app import bulk
+
+
+class Command(BaseCommand):
+    help = 'Import contacts for a user from a CSV or vCard file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='.csv, or .vcf / .vcard for vCard')
+        parser.add_argument('--chunk-size', type=int, default=bulk.CHUNK_SIZE)
+
+    def handle(self, username, path, chunk_size, **options):
+        try:
+            manager = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError('no user named {}'.format(username))
+
+        def progress(result):
+            self.stdout.write('\r{} rows read, {} imported, {} skipped'.format(
+                result.rows, result.created, result.failed), ending='')
+            self.stdout.flush()
+
+        with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+            result = bulk.import_contacts(manager, bulk.reader_for(path)(f), chunk_size, progress)
+        self.stdout.write('')
+        for row, message in result.errors:
+            self.stderr.write('row {}: {}'.format(row, message))
+        self.stdout.write(self.style.SUCCESS('imported {} of {} contacts'.format(result.created, result.rows)))
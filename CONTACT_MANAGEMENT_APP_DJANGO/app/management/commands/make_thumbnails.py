@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Contact
+from app.thumbnails import make_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Make the missing thumbnails of all contact images'
+
+    def handle(self, *args, **options):
+        names = Contact.objects.exclude(image='').values_list('image', flat=True).distinct()
+        made = failed = 0
+        for name in names.iterator():
+            try:
+                made += make_thumbnails(name)
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write('{}: {}'.format(name, e))
+        self.stdout.write(self.style.SUCCESS('made {} thumbnails, {} images failed'.format(made, failed)))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = 'Refill the full-text search table from the contacts table'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write('full-text search is not available on this database, nothing to do')
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('indexed {} contacts'.format(count)))
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+def create_fts(apps, schema_editor):
+    # SQLite only, and only when it was built with FTS5; app.search falls back to LIKE otherwise
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE app_contact_fts USING fts5(owner, name, email, info, phone)')
+    except OperationalError:
+        return
+    schema_editor.execute(
+        "INSERT INTO app_contact_fts (rowid, owner, name, email, info, phone) "
+        "SELECT id, 'm' || manager_id, name, email, info, phone FROM app_contact")
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS app_contact_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_auto_20200502_1342'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['manager', 'name'], name='app_contact_manager_name_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
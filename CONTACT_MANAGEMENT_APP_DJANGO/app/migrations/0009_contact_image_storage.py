@@ -0,0 +1,17 @@
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_contact_listing_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='image',
+            field=models.ImageField(blank=True, storage=app.storage.ContentAddressedStorage(), upload_to='images/'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 # Create your models here.
 from django.utils.timezone import datetime
 from django.contrib.auth.models import User
+from .storage import image_storage
 
 class Contact(models.Model):
     manager = models.ForeignKey(User, on_delete=models.CASCADE,default=None)
@@ -14,9 +15,15 @@ class Contact(models.Model):
         ('male', 'Male'),
         ('female', 'Female')
     ))
-    image = models.ImageField(upload_to='images/', blank=True)
+    image = models.ImageField(upload_to='images/', storage=image_storage, blank=True)
     date_added = models.DateTimeField(default=datetime.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['manager', 'name'], name='app_contact_manager_name_idx'),
+            models.Index(fields=['manager', 'date_added', 'id'], name='app_contact_manager_added_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -0,0 +1,46 @@
+# Keyset (cursor) pagination for contact lists, newest first.
+#
+# A page is "the next PER_PAGE contacts older than the last one shown", a range scan on the
+# (manager, date_added, id) index, so every page costs the same no matter how deep the user
+# scrolls, unlike OFFSET which reads and throws away all earlier rows. The cursor handed to
+# the client is the (date_added, id) of the last contact on the page; id breaks ties between
+# contacts added in the same instant.
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 24
+ORDERING = ('-date_added', '-id')
+# columns the contact card needs, manager_id is never read on a list page
+LIST_FIELDS = ('id', 'name', 'email', 'phone', 'info', 'gender', 'image', 'date_added')
+
+
+def encode_cursor(contact):
+    raw = '{}|{}'.format(contact.date_added.isoformat(), contact.pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # (date_added, id), or None for a missing cursor (the first page); ValueError when malformed
+    if not cursor:
+        return None
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    date_added, pk = raw.rsplit('|', 1)
+    date_added = parse_datetime(date_added)
+    if date_added is None:
+        raise ValueError('malformed cursor')
+    return date_added, int(pk)
+
+
+def keyset_page(queryset, after=None, per_page=PER_PAGE):
+    # (contacts, next cursor or None) for the page after `after`, a decode_cursor() value
+    queryset = queryset.only(*LIST_FIELDS).order_by(*ORDERING)
+    if after is not None:
+        date_added, pk = after
+        queryset = queryset.filter(Q(date_added__lt=date_added) | Q(date_added=date_added, id__lt=pk))
+    contacts = list(queryset[:per_page + 1])
+    if len(contacts) > per_page:
+        contacts = contacts[:per_page]
+        return contacts, encode_cursor(contacts[-1])
+    return contacts, None
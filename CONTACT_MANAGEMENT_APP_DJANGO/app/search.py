@@ -0,0 +1,134 @@
+# Full-text contact search.
+#
+# Contacts are mirrored into an SQLite FTS5 table (created by migration 0007), one row per
+# contact keyed by its id. The manager is stored as a token in the `owner` column, so a search
+# only ever touches the postings of one manager's contacts. Results are ranked with bm25, name
+# matches weigh most, and fetched one page at a time.
+#
+# The signals in app/signals.py keep the table in sync with Contact saves and deletes. Bulk
+# operations bypass signals and should call index_contacts() or index_new_contacts(), or run
+# `python manage.py rebuild_search_index`.
+#
+# On databases without FTS5 search falls back to the old LIKE query.
+import re
+
+from django.db import connection, OperationalError
+from django.db.models import Q
+
+from .models import Contact
+
+FTS_TABLE = 'app_contact_fts'
+# bm25 column weights: owner, name, email, info, phone
+WEIGHTS = (0.0, 10.0, 4.0, 1.0, 4.0)
+PER_PAGE = 24
+
+_available = None
+
+
+def fts_available():
+    global _available
+    if _available is None:
+        if connection.vendor != 'sqlite':
+            _available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                _available = cursor.fetchone() is not None
+    return _available
+
+
+def owner_token(manager_id):
+    return 'm{}'.format(manager_id)
+
+
+def match_query(manager_id, term):
+    # every word of the term as a prefix, all of them must match; None when there is no word
+    words = re.findall(r'\w+', term.lower())
+    if not words:
+        return None
+    return 'owner:{} AND {}'.format(
+        owner_token(manager_id), ' AND '.join('"{}"*'.format(w) for w in words))
+
+
+def index_contacts(contacts):
+    if not fts_available():
+        return
+    contacts = list(contacts)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [(c.pk,) for c in contacts])
+        cursor.executemany(
+            'INSERT INTO {} (rowid, owner, name, email, info, phone) '
+            'VALUES (%s, %s, %s, %s, %s, %s)'.format(FTS_TABLE),
+            [(c.pk, owner_token(c.manager_id), c.name, c.email, c.info, str(c.phone))
+             for c in contacts])
+
+
+def index_new_contacts(manager_id, after_id):
+    # adds the manager's contacts with an id above after_id in one statement, for bulk inserts
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        # rows a concurrent save() already indexed are replaced, not duplicated
+        cursor.execute(
+            "DELETE FROM {} WHERE rowid IN "
+            "(SELECT id FROM app_contact WHERE manager_id = %s AND id > %s)".format(FTS_TABLE),
+            [manager_id, after_id])
+        cursor.execute(
+            "INSERT INTO {} (rowid, owner, name, email, info, phone) "
+            "SELECT id, 'm' || manager_id, name, email, info, phone FROM app_contact "
+            "WHERE manager_id = %s AND id > %s".format(FTS_TABLE), [manager_id, after_id])
+
+
+def unindex_contacts(pks):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [(pk,) for pk in pks])
+
+
+def rebuild_index():
+    # refill the table from app_contact, returns the number of contacts indexed
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(FTS_TABLE))
+        cursor.execute(
+            "INSERT INTO {} (rowid, owner, name, email, info, phone) "
+            "SELECT id, 'm' || manager_id, name, email, info, phone FROM app_contact".format(FTS_TABLE))
+        return cursor.rowcount
+
+
+def _like_search(manager, term):
+    return Contact.objects.filter(manager=manager).filter(
+        Q(name__icontains=term) |
+        Q(email__icontains=term) |
+        Q(info__icontains=term) |
+        Q(phone__iexact=term)
+    ).order_by('name', 'id')
+
+
+def search_contacts(manager, term, page=1, per_page=PER_PAGE):
+    # (contacts, has_next) for one page of the manager's contacts matching term, best first
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    query = match_query(manager.pk, term)
+    if fts_available() and query is not None:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT rowid FROM {0} WHERE {0} MATCH %s '
+                    'ORDER BY bm25({0}, {1}) LIMIT %s OFFSET %s'.format(
+                        FTS_TABLE, ', '.join(str(w) for w in WEIGHTS)),
+                    [query, per_page + 1, offset])
+                ids = [row[0] for row in cursor.fetchall()]
+        except OperationalError:
+            ids = None
+        if ids is not None:
+            found = Contact.objects.filter(manager=manager).in_bulk(ids[:per_page])
+            contacts = [found[pk] for pk in ids[:per_page] if pk in found]
+            return contacts, len(ids) > per_page
+    results = list(_like_search(manager, term)[offset:offset + per_page + 1])
+    return results[:per_page], len(results) > per_page
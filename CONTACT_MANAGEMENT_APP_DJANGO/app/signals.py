@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Contact
+from . import cache, search, thumbnails
+
+
+@receiver(post_save, sender=Contact)
+def index_contact(sender, instance, **kwargs):
+    search.index_contacts([instance])
+
+
+@receiver(post_save, sender=Contact)
+def thumbnail_contact(sender, instance, **kwargs):
+    if instance.image:
+        thumbnails.schedule_on_commit(instance.image.name)
+
+
+@receiver(post_delete, sender=Contact)
+def unindex_contact(sender, instance, **kwargs):
+    search.unindex_contacts([instance.pk])
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def invalidate_cache(sender, instance, **kwargs):
+    # after the commit, so nobody re-caches the old rows under the new version
+    manager_id = instance.manager_id
+    transaction.on_commit(lambda: cache.invalidate(manager_id))
@@ -0,0 +1,30 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # files are named after the sha256 of their content (images/ab/abcdef....png), so the same
+    # picture uploaded twice is stored once and its thumbnails are made once
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension).replace('\\', '/')
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+image_storage = ContentAddressedStorage()
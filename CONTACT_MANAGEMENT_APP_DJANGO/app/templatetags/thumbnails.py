@@ -0,0 +1,12 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(image, size=None):
+    # {{ contact.image|thumbnail }} for the card size, {{ contact.image|thumbnail:256 }} for one of
+    # settings.THUMBNAIL_SIZES
+    return thumbnails.thumbnail_url(image, thumbnails.CARD_SIZE if size is None else int(size))
@@ -1,3 +1,224 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Contact
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .search import search_contacts
+from . import search, thumbnails
+from .templatetags.thumbnails import thumbnail
+
+# a local memory cache instead of the shared files in cache/, cleared before every test: ids are
+# reused once a test's rows are rolled back, and so would be the cache entries of the old rows
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+def make_contact(manager, name, date_added=None, **fields):
+    values = {'email': '{}@example.com'.format(name.lower().replace(' ', '.')), 'phone': 9800000000,
+              'info': 'friend', 'gender': 'female'}
+    values.update(fields)
+    return Contact.objects.create(manager=manager, name=name, date_added=date_added or timezone.now(), **values)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OwnContactsOnlyTests(TestCase):
+    # reads inside the test transaction stay on 'default' (contacts/sqlite_backend/router.py)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        self.contact = make_contact(self.alice, 'Carol')
+        self.client.login(username='bob', password='pw')
+
+    def test_detail_of_another_users_contact_is_404(self):
+        self.assertEqual(self.client.get(reverse('detail', args=[self.contact.pk])).status_code, 404)
+
+    def test_update_of_another_users_contact_is_404(self):
+        url = reverse('update', args=[self.contact.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.post(url, {'name': 'Mallory', 'email': 'm@example.com', 'phone': 1,
+                                          'info': 'x', 'gender': 'male'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Contact.objects.get(pk=self.contact.pk).name, 'Carol')
+
+    def test_delete_of_another_users_contact_is_404(self):
+        url = reverse('delete', args=[self.contact.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertTrue(Contact.objects.filter(pk=self.contact.pk).exists())
+
+    def test_owner_sees_the_contact(self):
+        self.client.login(username='alice', password='pw')
+        self.assertEqual(self.client.get(reverse('detail', args=[self.contact.pk])).status_code, 200)
+
+    def test_list_pages_are_cached_per_user(self):
+        self.client.login(username='alice', password='pw')
+        self.assertEqual(len(self.client.get(reverse('contacts_json')).json()['contacts']), 1)
+        self.client.login(username='bob', password='pw')
+        self.assertEqual(self.client.get(reverse('contacts_json')).json()['contacts'], [])
+
+    def test_malformed_cursor_is_400(self):
+        for cursor in ('zzz', '!!!', 'aGVsbG8', 'fHw'):
+            self.assertEqual(self.client.get(reverse('home'), {'after': cursor}).status_code, 400)
+            self.assertEqual(self.client.get(reverse('contacts_json'), {'after': cursor}).status_code, 400)
+
+
+# the cache is invalidated in transaction.on_commit(), which only runs when transactions commit
+@override_settings(CACHES=TEST_CACHES)
+class CacheInvalidationTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.contact = make_contact(self.alice, 'Carol', timezone.now() - timedelta(days=1))
+        self.client.login(username='alice', password='pw')
+
+    def names(self):
+        return [c['name'] for c in self.client.get(reverse('contacts_json')).json()['contacts']]
+
+    def test_new_contact_shows_up(self):
+        self.assertEqual(self.names(), ['Carol'])
+        make_contact(self.alice, 'Dave')
+        self.assertEqual(self.names(), ['Dave', 'Carol'])
+
+    def test_edited_contact_is_updated(self):
+        self.assertEqual(self.names(), ['Carol'])
+        self.contact.name = 'Caroline'
+        self.contact.save()
+        self.assertEqual(self.names(), ['Caroline'])
+
+    def test_deleted_contact_disappears(self):
+        self.assertEqual(self.names(), ['Carol'])
+        self.contact.delete()
+        self.assertEqual(self.names(), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+
+    def walk(self, per_page):
+        # ids of all pages in order, following the cursors like the client does
+        ids, after = [], None
+        # a page that repeats rows would never end, give up after twice the rows there are
+        for _ in range(2 * Contact.objects.count() + 1):
+            contacts, cursor = keyset_page(Contact.objects.filter(manager=self.alice), after, per_page)
+            ids += [c.pk for c in contacts]
+            if cursor is None:
+                return ids
+            after = decode_cursor(cursor)
+        self.fail('pagination did not terminate')
+
+    def test_equal_dates_neither_repeat_nor_skip(self):
+        now = timezone.now()
+        # whole runs of contacts added in the same instant, page boundaries fall inside them
+        contacts = [make_contact(self.alice, 'c{}'.format(i), now - timedelta(minutes=i // 10)) for i in range(35)]
+        make_contact(self.bob, 'other', now)
+        expected = [c.pk for c in sorted(contacts, key=lambda c: (c.date_added, c.pk), reverse=True)]
+        for per_page in (1, 3, 7, 10, 35, 50):
+            self.assertEqual(self.walk(per_page), expected)
+
+    def test_last_page_has_no_cursor(self):
+        for i in range(4):
+            make_contact(self.alice, 'c{}'.format(i))
+        contacts, cursor = keyset_page(Contact.objects.filter(manager=self.alice), None, 4)
+        self.assertEqual(len(contacts), 4)
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip(self):
+        contact = make_contact(self.alice, 'c', timezone.now().replace(microsecond=123456))
+        self.assertEqual(decode_cursor(encode_cursor(contact)), (contact.date_added, contact.pk))
+        self.assertIsNone(decode_cursor(''))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_json_pages_follow_the_cursor(self):
+        now = timezone.now()
+        for i in range(30):
+            make_contact(self.alice, 'c{}'.format(i), now)
+        self.client.login(username='alice', password='pw')
+        first = self.client.get(reverse('contacts_json')).json()
+        second = self.client.get(reverse('contacts_json'), {'after': first['next']}).json()
+        ids = [c['id'] for c in first['contacts'] + second['contacts']]
+        self.assertEqual((len(first['contacts']), len(second['contacts'])), (24, 6))
+        self.assertEqual(sorted(ids, reverse=True), ids)
+        self.assertIsNone(second['next'])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        make_contact(self.alice, 'Anna Smith', info='climbing')
+        make_contact(self.alice, 'Annabel Jones', email='aj@work.example', phone=5551234)
+        make_contact(self.alice, 'Zoe Smith')
+        for i in range(5):
+            make_contact(self.bob, 'Anna Other {}'.format(i), info='climbing')
+
+    def names(self, manager, term, **kwargs):
+        contacts, has_next = search_contacts(manager, term, **kwargs)
+        return sorted(c.name for c in contacts), has_next
+
+    def test_never_returns_another_managers_contacts(self):
+        self.assertTrue(search.fts_available())
+        for term in ('anna', 'climbing', 'other', 'smith'):
+            contacts, _ = search_contacts(self.alice, term)
+            self.assertTrue(all(c.manager_id == self.alice.pk for c in contacts), term)
+        self.assertEqual(self.names(self.alice, 'other'), ([], False))
+
+    def test_words_match_as_prefixes_and_all_must_match(self):
+        self.assertEqual(self.names(self.alice, 'ann'), (['Anna Smith', 'Annabel Jones'], False))
+        self.assertEqual(self.names(self.alice, 'ann smi'), (['Anna Smith'], False))
+        self.assertEqual(self.names(self.alice, 'work'), (['Annabel Jones'], False))
+
+    def test_name_matches_rank_first(self):
+        make_contact(self.alice, 'Climbing Club', info='anna')
+        contacts, _ = search_contacts(self.alice, 'climbing')
+        self.assertEqual(contacts[0].name, 'Climbing Club')
+
+    def test_pages(self):
+        first, has_next = search_contacts(self.bob, 'anna', page=1, per_page=3)
+        second, more = search_contacts(self.bob, 'anna', page=2, per_page=3)
+        self.assertEqual((len(first), has_next, len(second), more), (3, True, 2, False))
+        self.assertFalse({c.pk for c in first} & {c.pk for c in second})
+
+    def test_deleted_and_edited_contacts_leave_the_index(self):
+        anna = Contact.objects.get(name='Anna Smith')
+        anna.name, anna.email = 'Hannah Smith', 'hannah@example.com'
+        anna.save()
+        self.assertEqual(self.names(self.alice, 'anna'), (['Annabel Jones'], False))
+        Contact.objects.get(name='Annabel Jones').delete()
+        self.assertEqual(self.names(self.alice, 'ann'), ([], False))
+
+    def test_like_fallback_without_fts5(self):
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            self.assertEqual(self.names(self.alice, 'anna'), (['Anna Smith', 'Annabel Jones'], False))
+            self.assertEqual(self.names(self.alice, 'climb'), (['Anna Smith'], False))
+            self.assertEqual(self.names(self.alice, '5551234'), (['Annabel Jones'], False))
+            self.assertEqual(self.names(self.alice, 'other'), ([], False))
+            # contacts can still be saved while there is no index to keep in sync
+            make_contact(self.alice, 'Anna New')
+            self.assertEqual(self.names(self.alice, 'anna', per_page=2), (['Anna New', 'Anna Smith'], True))
+
+    def test_term_without_words_uses_the_like_query(self):
+        make_contact(self.alice, 'R&D')
+        self.assertEqual(self.names(self.alice, '&'), (['R&D'], False))
+
+
+class ThumbnailTests(TestCase):
+    def test_cards_use_a_size_that_is_made(self):
+        self.assertIn(thumbnails.CARD_SIZE, thumbnails.THUMBNAIL_SIZES)
+        with mock.patch.object(thumbnails, 'CARD_SIZE', 128), \
+                mock.patch.object(thumbnails, 'thumbnail_url') as thumbnail_url:
+            thumbnail('images/a.jpg')
+            thumbnail('images/a.jpg', '64')
+        self.assertEqual([c.args[1] for c in thumbnail_url.call_args_list], [128, 64])
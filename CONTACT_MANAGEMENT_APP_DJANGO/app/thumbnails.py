@@ -0,0 +1,108 @@
+# Fixed-size thumbnails of Contact.image.
+#
+# Cards show a THUMBNAIL_SIZES[-1] px thumbnail instead of the full upload. Thumbnails are
+# made off the request by a small thread pool (Pillow releases the GIL while resizing) once
+# the saving transaction commits, and live next to the original under thumbs/<size>/, so
+# content-addressed originals (see app/storage.py) share their thumbnails too. Until a
+# thumbnail exists the original is served. `python manage.py make_thumbnails` fills in
+# thumbnails for images uploaded before this existed.
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = getattr(settings, 'THUMBNAIL_SIZES', (256,))
+# the size contact cards show, always one of the sizes that are made
+CARD_SIZE = THUMBNAIL_SIZES[-1]
+# JPEG everywhere, or WEBP for smaller files when Pillow was built with it
+THUMBNAIL_FORMAT = getattr(settings, 'THUMBNAIL_FORMAT', 'JPEG')
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+_pool = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def thumbnail_name(name, size):
+    # images/ab/abcd.png -> thumbs/256/images/ab/abcd.jpg
+    stem = os.path.splitext(name)[0]
+    return 'thumbs/{}/{}{}'.format(size, stem, EXTENSIONS[THUMBNAIL_FORMAT])
+
+
+def make_thumbnails(name):
+    # writes the missing thumbnails of the stored image `name`, returns how many were made
+    from PIL import Image, ImageOps
+
+    todo = [size for size in THUMBNAIL_SIZES if not image_storage.exists(thumbnail_name(name, size))]
+    if not todo:
+        return 0
+    with image_storage.open(name) as f:
+        image = Image.open(f)
+        image.load()
+    if hasattr(ImageOps, 'exif_transpose'):
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    for size in sorted(todo, reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS)
+        path = image_storage.path(thumbnail_name(name, size))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # a temporary file of its own: other threads and processes may be writing the same thumbnail
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, THUMBNAIL_FORMAT, quality=80, optimize=True)
+            # mkstemp makes the file private, thumbnails are served like any upload
+            os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    return len(todo)
+
+
+def _run(name):
+    try:
+        make_thumbnails(name)
+    except Exception:
+        logger.exception('could not make thumbnails of %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def schedule(name):
+    # queue thumbnail generation for an image, at most once at a time per image
+    global _pool
+    if not name:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+    _pool.submit(_run, name)
+
+
+def schedule_on_commit(name):
+    transaction.on_commit(lambda: schedule(name))
+
+
+def thumbnail_url(image, size=CARD_SIZE):
+    # url of the thumbnail of an ImageField value, or of the original while it is being made
+    if not image:
+        return ''
+    thumb = thumbnail_name(image.name, size)
+    if image_storage.exists(thumb):
+        return image_storage.url(thumb)
+    schedule(image.name)
+    return image.url
@@ -1,8 +1,9 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 urlpatterns = [
     # path('', views.home, name="home"),
     path('', views.HomePageView.as_view(), name="home"),
+    path('contacts.json', views.contacts_json, name="contacts_json"),
     # path('detail/<int:id>/', views.detail, name="detail"),
     path('detail/<int:pk>/', views.ContactDetailView.as_view(), name="detail"),
     path('search/', views.search, name="search"),
@@ -11,5 +12,8 @@ urlpatterns = [
          views.ContactUpdateView.as_view(), name="update"),
     path('contacts/delete/<int:pk>',
          views.ContactDeleteView.as_view(), name="delete"),
+    path('contacts/import', views.import_contacts, name="import"),
+    re_path(r'^contacts/export\.(?P<format>csv|vcf)$',
+            views.export_contacts, name="export"),
     path('signup/', views.SignUpView.as_view(), name="signup"),
 ]
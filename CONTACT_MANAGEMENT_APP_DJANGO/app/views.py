@@ -1,4 +1,7 @@
+import io
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse, StreamingHttpResponse, Http404, HttpResponseBadRequest
+from django.template.loader import render_to_string
 from .models import Contact
 from django.views.generic import ListView, DetailView
 from django.db.models import Q
@@ -8,6 +11,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
 from django.contrib import messages
+from .search import search_contacts
+from .cache import contact_page, contact as cached_contact
+from .pagination import decode_cursor
+from .thumbnails import thumbnail_url, THUMBNAIL_SIZES
+from . import bulk
 
 # def home(request):
 #     context = {
@@ -32,32 +40,105 @@ class HomePageView(LoginRequiredMixin, ListView):
         contacts = super().get_queryset()
         return contacts.filter(manager=self.request.user)
 
+    def get(self, request, *args, **kwargs):
+        try:
+            self.after = decode_cursor(request.GET.get('after'))
+        except ValueError:
+            return HttpResponseBadRequest('invalid cursor')
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        # one keyset page instead of the whole list, see app/pagination.py and app/cache.py
+        contacts, next_cursor = contact_page(self.request.user, self.after)
+        kwargs['next_cursor'] = next_cursor
+        return super().get_context_data(object_list=contacts, **kwargs)
+
+
+@login_required
+def contacts_json(request):
+    # the home page listing as JSON, for infinite scroll: ?after=<cursor> gives the next page
+    try:
+        after = decode_cursor(request.GET.get('after'))
+    except ValueError:
+        return JsonResponse({'error': 'invalid cursor'}, status=400)
+    contacts, next_cursor = contact_page(request.user, after)
+    return JsonResponse({
+        'contacts': [{
+            'id': contact.pk,
+            'name': contact.name,
+            'email': contact.email,
+            'phone': contact.phone,
+            'info': contact.info,
+            'gender': contact.gender,
+            'image': contact.image.url if contact.image else None,
+            'thumbnails': {
+                size: thumbnail_url(contact.image, size) for size in THUMBNAIL_SIZES
+            } if contact.image else None,
+            'date_added': contact.date_added.isoformat(),
+        } for contact in contacts],
+        'html': render_to_string(
+            'partials/_cards.html', {'contacts': contacts}, request=request),
+        'next': next_cursor,
+    })
+
 
 class ContactDetailView(LoginRequiredMixin, DetailView):
     template_name = 'detail.html'
     model = Contact
     context_object_name = 'contact'
 
+    def get_object(self, queryset=None):
+        # only the user's own contacts, from the per-user cache
+        contact = cached_contact(self.request.user, self.kwargs['pk'])
+        if contact is None:
+            raise Http404('No contact found')
+        return contact
+
 
 @login_required
 def search(request):
     if request.GET:
         search_term = request.GET['search_term']
-        search_results = Contact.objects.filter(
-            Q(name__icontains=search_term) |
-            Q(email__icontains=search_term) |
-            Q(info__icontains=search_term) |
-            Q(phone__iexact=search_term)
-        )
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 1
+        contacts, has_next = search_contacts(request.user, search_term, page)
         context = {
             'search_term': search_term,
-            'contacts': search_results.filter(manager=request.user)
+            'contacts': contacts,
+            'page': page,
+            'previous_page': page - 1 if page > 1 else None,
+            'next_page': page + 1 if has_next else None,
         }
         return render(request, 'search.html', context)
     else:
         return redirect('home')
 
 
+@login_required
+def import_contacts(request):
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+        result = bulk.import_contacts(request.user, bulk.reader_for(upload.name)(lines))
+        messages.success(request, 'Imported {} of {} contacts.'.format(result.created, result.rows))
+        return render(request, 'import.html', {'result': result})
+    return render(request, 'import.html')
+
+
+@login_required
+def export_contacts(request, format):
+    # the whole contact list as a download, streamed row by row
+    if format == 'vcf':
+        rows, content_type = bulk.export_vcard(request.user), 'text/vcard'
+    else:
+        rows, content_type = bulk.export_csv(request.user), 'text/csv'
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="contacts.{}"'.format(format)
+    return response
+
+
 class ContactCreateView(LoginRequiredMixin, CreateView):
     model = Contact
     template_name = 'create.html'
@@ -83,6 +164,9 @@ class ContactUpdateView(LoginRequiredMixin, UpdateView):
             self.request, 'Your contact has been successfully updated!')
         return redirect('detail', instance.pk)
 
+    def get_queryset(self):
+        return super().get_queryset().filter(manager=self.request.user)
+
 
 class ContactDeleteView(LoginRequiredMixin, DeleteView):
     model = Contact
@@ -94,6 +178,9 @@ class ContactDeleteView(LoginRequiredMixin, DeleteView):
             self.request, 'Your contact has been successfully deleted!')
         return super().delete(self, request, *args, **kwargs)
 
+    def get_queryset(self):
+        return super().get_queryset().filter(manager=self.request.user)
+
 
 class SignUpView(CreateView):
     form_class = UserCreationForm
@@ -0,0 +1,114 @@
+# Concurrency benchmark for the SQLite settings: writer and reader processes (like gunicorn
+# workers) hammer a scratch copy of the contacts table, first with SQLite's defaults
+# (rollback journal, 5 s busy timeout like Django's sqlite3 backend), then with the
+# production profile from contacts/sqlite_backend (WAL, pragmas, separate read-only readers).
+#
+#   python benchmark_db.py --writers 4 --readers 8 --seconds 5
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from multiprocessing import Pool
+
+from contacts.sqlite_backend.base import DEFAULT_PRAGMAS
+
+PROFILES = {
+    'default': {'pragmas': {}, 'read_pragmas': {}, 'timeout': 5, 'read_only': False},
+    'production': {'pragmas': DEFAULT_PRAGMAS,
+                   'read_pragmas': {'query_only': 1, 'cache_size': -20000, 'mmap_size': 268435456},
+                   'timeout': 20, 'read_only': True},
+}
+MANAGERS = 50
+
+
+def connect(path, profile, reader):
+    settings = PROFILES[profile]
+    if reader and settings['read_only']:
+        conn = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True, timeout=settings['timeout'])
+        pragmas = settings['read_pragmas']
+    else:
+        conn = sqlite3.connect(path, timeout=settings['timeout'])
+        pragmas = settings['pragmas']
+    for name, value in pragmas.items():
+        conn.execute('PRAGMA {} = {}'.format(name, value))
+    return conn
+
+
+def setup(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE contact (id INTEGER PRIMARY KEY, manager_id INTEGER, name TEXT, '
+                 'email TEXT, phone INTEGER, info TEXT, gender TEXT, date_added TEXT)')
+    conn.execute('CREATE INDEX contact_manager_added ON contact (manager_id, date_added, id)')
+    conn.executemany('INSERT INTO contact (manager_id, name, email, phone, info, gender, date_added) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     ((i % MANAGERS, 'name %d' % i, 'p%d@example.com' % i, i, 'info', 'male',
+                       '%012d' % i) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def work(args):
+    # (operations, "database is locked" errors) of one worker
+    path, profile, reader, seconds, seed = args
+    rng = random.Random(seed)
+    conn = connect(path, profile, reader)
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        manager = rng.randrange(MANAGERS)
+        try:
+            if reader:
+                conn.execute('SELECT id, name, email, phone, info, gender, date_added FROM contact '
+                             'WHERE manager_id = ? ORDER BY date_added DESC, id DESC LIMIT 24',
+                             (manager,)).fetchall()
+            else:
+                with conn:
+                    conn.execute('INSERT INTO contact (manager_id, name, email, phone, info, gender, '
+                                 'date_added) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (manager, 'new', 'new@example.com', 1, 'info', 'female',
+                                  '%012d' % int(time.time() * 1e6)))
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    return reader, done, errors
+
+
+def run(profile, writers, readers, seconds, rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        setup(path, rows)
+        if profile == 'production':
+            # WAL is a property of the database file, set once by a writer
+            connect(path, profile, reader=False).close()
+        jobs = [(path, profile, False, seconds, i) for i in range(writers)]
+        jobs += [(path, profile, True, seconds, writers + i) for i in range(readers)]
+        with Pool(len(jobs)) as pool:
+            results = pool.map(work, jobs)
+    totals = {True: [0, 0], False: [0, 0]}
+    for reader, done, errors in results:
+        totals[reader][0] += done
+        totals[reader][1] += errors
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare SQLite throughput with and without the production profile')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=100000, help='contacts in the table before the run')
+    args = parser.parse_args()
+
+    print('{} writers, {} readers, {} s, {} rows'.format(args.writers, args.readers, args.seconds, args.rows))
+    for profile in ('default', 'production'):
+        totals = run(profile, args.writers, args.readers, args.seconds, args.rows)
+        print('{:>10}: {:8.0f} writes/s ({} locked)  {:9.0f} reads/s ({} locked)'.format(
+            profile, totals[False][0] / args.seconds, totals[False][1],
+            totals[True][0] / args.seconds, totals[True][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 import os
+from urllib.request import pathname2url
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -27,7 +30,12 @@ INSTALLED_APPS = [
     'import_export',
 ]
 
+# REQUEST_PROFILING=1 turns on per-request timing of SQL, templates and outbound HTTP, with
+# slow query and N+1 logging and Prometheus totals at /__profile__/ (contacts/profiling.py)
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+
 MIDDLEWARE = [
+    'contacts.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,13 +69,72 @@ WSGI_APPLICATION = 'contacts.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# SQLite tuned for several server processes (contacts/sqlite_backend): WAL journal and the
+# pragmas in sqlite_backend/base.py on every connection, connections kept open for
+# CONN_MAX_AGE seconds, writers wait up to 20 s for the lock instead of failing with
+# "database is locked", and reads go to a second, read-only connection.
+
+DATABASE_PATH = os.path.join(BASE_DIR, 'db.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'ENGINE': 'contacts.sqlite_backend',
+        'NAME': DATABASE_PATH,
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+    },
+    'read': {
+        'ENGINE': 'contacts.sqlite_backend',
+        'NAME': 'file:{}?mode=ro'.format(pathname2url(DATABASE_PATH)),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+        'PRAGMAS': {'query_only': 1, 'cache_size': -20000, 'temp_store': 'MEMORY', 'mmap_size': 268435456},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['contacts.sqlite_backend.router.ReadReplicaRouter']
+
+
+# Cache
+# Contact lists and contacts are cached per user (app/cache.py). Invalidation bumps a version
+# stored in the cache, so every server process has to see the same cache: the default
+# CONTACTS_CACHE=file shares it through files in cache/, CONTACTS_CACHE=db through a table in
+# the database (run `python manage.py createcachetable`). CONTACTS_CACHE=locmem is per process
+# and only allowed with a single worker (WEB_CONCURRENCY, which gunicorn reads, unset or 1).
+
+CACHE_BACKEND = os.environ.get('CONTACTS_CACHE', 'file')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'contacts_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+        raise ImproperlyConfigured(
+            'CONTACTS_CACHE=locmem is per process, other workers would serve stale contacts; '
+            'use file or db with WEB_CONCURRENCY > 1')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'contacts',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    raise ImproperlyConfigured('CONTACTS_CACHE must be file, db or locmem, not {!r}'.format(CACHE_BACKEND))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -121,3 +188,11 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'
 LOGIN_REDIRECT_URL = 'home'
+
+# slow queries and possible N+1 patterns found by the profiling middleware
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'contacts.profiling': {'handlers': ['console'], 'level': 'WARNING'}},
+}
@@ -0,0 +1 @@
+# SQLite tuned for several server processes: see base.py, router.py and DATABASES in settings.py
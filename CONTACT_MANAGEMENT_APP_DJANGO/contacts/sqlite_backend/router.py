@@ -0,0 +1,22 @@
+# Sends reads to the read-only 'read' connection and writes to 'default', the SQLite take on
+# a read replica: in WAL mode both see the same file, and reads on their own connection never
+# queue behind a write transaction. Inside a transaction reads stay on 'default' so they see
+# the transaction's own writes.
+from django.db import connections
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if 'read' not in connections.databases or connections['default'].in_atomic_block:
+            return 'default'
+        return 'read'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -2,7 +2,9 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from contacts import profiling
 urlpatterns = [
+    path('__profile__/', profiling.metrics, name='profile_metrics'),
     path('admin/', admin.site.urls),
     path('', include('app.urls')),
     path('',include('django.contrib.auth.urls')),
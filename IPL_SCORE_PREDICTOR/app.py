@@ -1,82 +1,125 @@
-# -*- coding: utf-8 -*-
-"""
-Created on Sat Jul 18 16:53:51 2020
-
-@author: Asus
-"""
-
-# Importing essential libraries
-from flask import Flask, render_template, request
-import pickle
-import numpy as np
-
-# Load the Random Forest CLassifier model
-filename = 'model.pkl'
-regressor = pickle.load(open(filename, 'rb'))
-
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-	return render_template('index1.html')
-
-@app.route('/predict', methods=['POST'])
-def predict():
-    temp_array = list()
-    
-    if request.method == 'POST':
-        
-        batting_team = request.form['batting-team']
-        if batting_team == 'Chennai Super Kings':
-            temp_array = temp_array + [1,0,0,0,0,0,0,0]
-        elif batting_team == 'Delhi Daredevils':
-            temp_array = temp_array + [0,1,0,0,0,0,0,0]
-        elif batting_team == 'Kings XI Punjab':
-            temp_array = temp_array + [0,0,1,0,0,0,0,0]
-        elif batting_team == 'Kolkata Knight Riders':
-            temp_array = temp_array + [0,0,0,1,0,0,0,0]
-        elif batting_team == 'Mumbai Indians':
-            temp_array = temp_array + [0,0,0,0,1,0,0,0]
-        elif batting_team == 'Rajasthan Royals':
-            temp_array = temp_array + [0,0,0,0,0,1,0,0]
-        elif batting_team == 'Royal Challengers Bangalore':
-            temp_array = temp_array + [0,0,0,0,0,0,1,0]
-        elif batting_team == 'Sunrisers Hyderabad':
-            temp_array = temp_array + [0,0,0,0,0,0,0,1]
-            
-            
-        bowling_team = request.form['bowling-team']
-        if bowling_team == 'Chennai Super Kings':
-            temp_array = temp_array + [1,0,0,0,0,0,0,0]
-        elif bowling_team == 'Delhi Daredevils':
-            temp_array = temp_array + [0,1,0,0,0,0,0,0]
-        elif bowling_team == 'Kings XI Punjab':
-            temp_array = temp_array + [0,0,1,0,0,0,0,0]
-        elif bowling_team == 'Kolkata Knight Riders':
-            temp_array = temp_array + [0,0,0,1,0,0,0,0]
-        elif bowling_team == 'Mumbai Indians':
-            temp_array = temp_array + [0,0,0,0,1,0,0,0]
-        elif bowling_team == 'Rajasthan Royals':
-            temp_array = temp_array + [0,0,0,0,0,1,0,0]
-        elif bowling_team == 'Royal Challengers Bangalore':
-            temp_array = temp_array + [0,0,0,0,0,0,1,0]
-        elif bowling_team == 'Sunrisers Hyderabad':
-            temp_array = temp_array + [0,0,0,0,0,0,0,1]
-            
-            
-        overs = float(request.form['overs'])
-        runs = int(request.form['runs'])
-        wickets = int(request.form['wickets'])
-        runs_in_prev_5 = int(request.form['runs_in_prev_5'])
-        wickets_in_prev_5 = int(request.form['wickets_in_prev_5'])
-        
-        temp_array = temp_array + [overs, runs, wickets, runs_in_prev_5, wickets_in_prev_5]
-        
-        data = np.array([temp_array])
-        my_prediction = int(regressor.predict(data)[0])
-              
-        return render_template('index1.html',prediction_text="Predicted score ranges between {} to {}".format(my_prediction-10,my_prediction+5))
-
-
-if __name__ == '__main__':
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jul 18 16:53:51 2020
+
+@author: Asus
+"""
+
+# Importing essential libraries
+from flask import Flask, render_template, request, jsonify, Response
+from features import encode_states, score_range
+from streaming import MatchHub
+from compact_model import load_model
+from microbatch import MicroBatcher
+
+# Load the regression model, from its compact copy (python compact_model.py export model.pkl model)
+# when it exists since that loads lazily and is shared between workers, else from the pickle
+filename = 'model.pkl'
+regressor = load_model('model', filename)
+
+# concurrent requests share one vectorised predict call, see microbatch.py
+batcher = MicroBatcher(regressor.predict)
+
+app = Flask(__name__)
+
+def project(states):
+    # (score, low, high) for every match state, one predict call
+    return [(int(p),) + score_range(p) for p in batcher.predict(encode_states(states))]
+
+# live matches fed ball by ball, see /matches/<match_id>/...
+hub = MatchHub(project)
+
+@app.route('/')
+def home():
+	return render_template('index1.html')
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    if request.method == 'POST':
+        
+        try:
+            data = encode_states([request.form])
+        except (KeyError, ValueError) as e:
+            return render_template('index1.html', prediction_text='Invalid input: {}'.format(e)), 400
+        low, high = score_range(batcher.predict(data)[0])
+              
+        return render_template('index1.html',prediction_text="Predicted score ranges between {} to {}".format(low,high))
+
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    # {"states": [{"batting-team": ..., "bowling-team": ..., "overs": ..., "runs": ..., "wickets": ...,
+    #   "runs_in_prev_5": ..., "wickets_in_prev_5": ...}, ...]} -> one predict call for all of them
+    body = request.get_json(silent=True)
+    states = body.get('states') if isinstance(body, dict) else body
+    if not isinstance(states, list):
+        return jsonify(error='expected a JSON list of match states'), 400
+    if not states:
+        return jsonify(predictions=[])
+    try:
+        data = encode_states(states)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify(error='invalid match state: {}'.format(e)), 400
+    predictions = batcher.predict(data)
+    return jsonify(predictions=[{'score': int(p), 'low': low, 'high': high}
+                                for p, (low, high) in zip(predictions, map(score_range, predictions))])
+
+
+@app.route('/matches/<match_id>', methods=['POST'])
+def start_match(match_id):
+    # {"batting-team": ..., "bowling-team": ...}
+    body = request.get_json(silent=True) or {}
+    if 'batting-team' not in body or 'bowling-team' not in body:
+        return jsonify(error='batting-team and bowling-team are required'), 400
+    try:
+        hub.start(match_id, body['batting-team'], body['bowling-team'])
+    except ValueError as e:
+        return jsonify(error=str(e)), 409
+    return jsonify(match=match_id), 201
+
+
+@app.route('/matches/<match_id>/balls', methods=['POST'])
+def add_balls(match_id):
+    # one delivery {"runs": 4, "wicket": false, "legal": true} or a list of them
+    balls = request.get_json(silent=True)
+    if isinstance(balls, dict):
+        balls = [balls]
+    if not isinstance(balls, list) or not all(isinstance(ball, dict) for ball in balls):
+        return jsonify(error='expected a delivery or a list of deliveries'), 400
+    try:
+        return jsonify(hub.add_balls(match_id, balls))
+    except KeyError:
+        return jsonify(error='unknown match {}'.format(match_id)), 404
+    except (TypeError, ValueError) as e:
+        return jsonify(error='invalid delivery: {}'.format(e)), 400
+
+
+@app.route('/matches/<match_id>/stream')
+def stream_match(match_id):
+    # Server-Sent Events with the match state and projection after every delivery; subscribing
+    # here rather than in the generator means a match finished in between still ends the stream
+    try:
+        q = hub.subscribe(match_id)
+    except KeyError:
+        return jsonify(error='unknown match {}'.format(match_id)), 404
+    response = Response(hub.events(match_id, q), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # a client gone before the first event never runs the generator's cleanup
+    response.call_on_close(lambda: hub.unsubscribe(match_id, q))
+    return response
+
+
+@app.route('/matches/<match_id>', methods=['DELETE'])
+def finish_match(match_id):
+    hub.finish(match_id)
+    return '', 204
+
+
+@app.route('/metrics')
+def metrics():
+    # queue depth and batch sizes of the inference batcher
+    return jsonify(batcher.stats())
+
+
+if __name__ == '__main__':
 	app.run(debug=True)
\ No newline at end of file
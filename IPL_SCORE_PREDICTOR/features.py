@@ -0,0 +1,34 @@
+# Feature encoding for the score regressor, in the column order used in IPLScore.ipynb:
+# 8 batting team dummies, 8 bowling team dummies, overs, runs, wickets, runs_last_5, wickets_last_5
+import numpy as np
+
+TEAMS = ['Chennai Super Kings', 'Delhi Daredevils', 'Kings XI Punjab', 'Kolkata Knight Riders',
+         'Mumbai Indians', 'Rajasthan Royals', 'Royal Challengers Bangalore', 'Sunrisers Hyderabad']
+TEAM_INDEX = {team: i for i, team in enumerate(TEAMS)}
+
+# one row per team, plus an all zero row for a team the model was not trained on
+ONE_HOT = np.vstack([np.eye(len(TEAMS)), np.zeros(len(TEAMS))])
+UNKNOWN_TEAM = len(TEAMS)
+
+# names of the fields in the form and in the JSON match states
+NUMERIC_FIELDS = ['overs', 'runs', 'wickets', 'runs_in_prev_5', 'wickets_in_prev_5']
+N_FEATURES = 2 * len(TEAMS) + len(NUMERIC_FIELDS)
+
+def encode_states(states):
+    # builds the whole feature matrix at once from a list of match states (dicts or form data)
+    n = len(states)
+    X = np.empty((n, N_FEATURES))
+    bat = np.fromiter((TEAM_INDEX.get(s['batting-team'], UNKNOWN_TEAM) for s in states), dtype=np.intp, count=n)
+    bowl = np.fromiter((TEAM_INDEX.get(s['bowling-team'], UNKNOWN_TEAM) for s in states), dtype=np.intp, count=n)
+    X[:, :len(TEAMS)] = ONE_HOT[bat]
+    X[:, len(TEAMS):2 * len(TEAMS)] = ONE_HOT[bowl]
+    X[:, 2 * len(TEAMS):] = [[float(s[field]) for field in NUMERIC_FIELDS] for s in states]
+    # float() accepts "nan" and "inf", which the regressor rejects
+    bad = ~np.isfinite(X).all(axis=1)
+    if bad.any():
+        raise ValueError('state {} has a value that is not a finite number'.format(int(np.flatnonzero(bad)[0])))
+    return X
+
+def score_range(prediction):
+    prediction = int(prediction)
+    return prediction - 10, prediction + 5
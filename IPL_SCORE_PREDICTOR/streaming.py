@@ -0,0 +1,148 @@
+# Ball by ball state of live matches, kept incrementally so every delivery costs O(1):
+# the runs and wickets of the last 5 overs are running sums over a window of deliveries
+import json
+import queue
+import threading
+from collections import deque
+
+BALLS_PER_OVER = 6
+WINDOW_BALLS = 5 * BALLS_PER_OVER
+# the regressor was trained on match states from the 5th over onwards
+MIN_OVERS = 5.0
+
+class MatchState:
+    def __init__(self, batting_team, bowling_team):
+        self.batting_team = batting_team
+        self.bowling_team = bowling_team
+        self.legal_balls = 0
+        self.runs = 0
+        self.wickets = 0
+        # (legal ball number, runs, wicket) of every delivery in the last 5 overs; wides and
+        # no-balls carry the number of the legal ball that follows them, they are part of its over
+        self.window = deque()
+        self.runs_in_prev_5 = 0
+        self.wickets_in_prev_5 = 0
+
+    @property
+    def overs(self):
+        # same notation as the training data, 7.2 is the 2nd ball of the 8th over
+        return self.legal_balls // BALLS_PER_OVER + (self.legal_balls % BALLS_PER_OVER) / 10
+
+    def add_ball(self, runs=0, wicket=False, legal=True):
+        # runs includes extras; wides and no-balls are not legal and do not advance the over
+        if legal:
+            self.legal_balls += 1
+        self.runs += runs
+        self.wickets += wicket
+        self.window.append((self.legal_balls if legal else self.legal_balls + 1, runs, wicket))
+        self.runs_in_prev_5 += runs
+        self.wickets_in_prev_5 += wicket
+        # every delivery enters and leaves the window once
+        while self.window and self.window[0][0] <= self.legal_balls - WINDOW_BALLS:
+            _, old_runs, old_wicket = self.window.popleft()
+            self.runs_in_prev_5 -= old_runs
+            self.wickets_in_prev_5 -= old_wicket
+
+    def features(self):
+        # a match state in the format of features.encode_states
+        return {
+            'batting-team': self.batting_team, 'bowling-team': self.bowling_team, 'overs': self.overs,
+            'runs': self.runs, 'wickets': self.wickets,
+            'runs_in_prev_5': self.runs_in_prev_5, 'wickets_in_prev_5': self.wickets_in_prev_5,
+        }
+
+def parse_ball(ball):
+    # (runs, wicket, legal) of one delivery {"runs": 4, "wicket": false, "legal": true}
+    runs = ball.get('runs', 0)
+    wicket = ball.get('wicket', False)
+    legal = ball.get('legal', True)
+    if isinstance(runs, bool) or not isinstance(runs, int) or runs < 0:
+        raise ValueError('runs must be a whole number of at least 0, got {!r}'.format(runs))
+    if not isinstance(wicket, bool) or not isinstance(legal, bool):
+        raise ValueError('wicket and legal must be true or false')
+    return runs, wicket, legal
+
+def offer(q, item):
+    # a slow subscriber loses its oldest update instead of blocking the ingest
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+class MatchHub:
+    # all live matches of this process and the Server-Sent Events subscribers of each
+    def __init__(self, project):
+        # project(list of match states) -> list of (score, low, high)
+        self.project = project
+        self.matches = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def start(self, match_id, batting_team, bowling_team):
+        # ValueError for a match that is already live, its subscribers would silently see the
+        # counts start over; finish() it first
+        with self.lock:
+            if match_id in self.matches:
+                raise ValueError('match {} is already live'.format(match_id))
+            self.matches[match_id] = MatchState(batting_team, bowling_team)
+            self.subscribers.setdefault(match_id, [])
+
+    def add_balls(self, match_id, balls):
+        # every delivery is checked before any is applied, a rejected list leaves the match as it was
+        balls = [parse_ball(ball) for ball in balls]
+        with self.lock:
+            match = self.matches[match_id]
+            for runs, wicket, legal in balls:
+                match.add_ball(runs, wicket, legal)
+            state = match.features()
+            listeners = list(self.subscribers.get(match_id, []))
+        update = dict(state)
+        if state['overs'] >= MIN_OVERS:
+            score, low, high = self.project([state])[0]
+            update.update(score=score, low=low, high=high)
+        for q in listeners:
+            offer(q, update)
+        return update
+
+    def subscribe(self, match_id):
+        q = queue.Queue(maxsize=100)
+        with self.lock:
+            if match_id not in self.matches:
+                raise KeyError(match_id)
+            self.subscribers[match_id].append(q)
+        return q
+
+    def unsubscribe(self, match_id, q):
+        with self.lock:
+            if q in self.subscribers.get(match_id, []):
+                self.subscribers[match_id].remove(q)
+
+    def finish(self, match_id):
+        with self.lock:
+            self.matches.pop(match_id, None)
+            listeners = self.subscribers.pop(match_id, [])
+        for q in listeners:
+            offer(q, None)
+
+    def events(self, match_id, q, keepalive=15):
+        # generator of Server-Sent Events for one match from a queue returned by subscribe(),
+        # ends when the match is finished
+        try:
+            while True:
+                try:
+                    update = q.get(timeout=keepalive)
+                except queue.Empty:
+                    # comment line, keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                if update is None:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+                yield 'data: {}\n\n'.format(json.dumps(update))
+        finally:
+            self.unsubscribe(match_id, q)
@@ -0,0 +1,224 @@
+# Opt-in request profiling, enabled with REQUEST_PROFILING = True in settings (environment
+# variable REQUEST_PROFILING=1).
+#
+# For every request the middleware records the wall time, the number and time of SQL queries
+# (through connection.execute_wrapper, on every database alias), the time spent rendering
+# templates and the time spent in outbound HTTP calls (http.client, which urllib, requests
+# and geopy all end up in). Each response gets a Server-Timing header with these numbers,
+# which browser dev tools show under the request's Timing tab.
+#
+# Queries slower than PROFILING_SLOW_QUERY_MS are logged, and so are N+1 patterns: the same
+# SQL (same text, only the parameters differ) run PROFILING_N_PLUS_ONE times or more in one
+# request, typically a query per row of a list.
+#
+# Totals per view are kept in memory, per process, and served as Prometheus text by
+# metrics() to staff users.
+import re
+import time
+import logging
+import threading
+import http.client
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, Http404
+from django.template import base as template_base
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = getattr(settings, 'PROFILING_SLOW_QUERY_MS', 100)
+N_PLUS_ONE = getattr(settings, 'PROFILING_N_PLUS_ONE', 5)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+_local = threading.local()
+
+
+class Profile:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.slow_queries = 0
+        self.statements = Counter()
+        self.template_seconds = 0.0
+        self.http_count = 0
+        self.http_seconds = 0.0
+        # nesting depth per timed section, only the outermost call is counted
+        self.depth = Counter()
+
+
+def _current():
+    return getattr(_local, 'profile', None)
+
+
+def _timed(section, add):
+    # wraps a function so its time goes to the current request's profile via add(profile, seconds)
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            profile = _current()
+            if profile is None:
+                return func(*args, **kwargs)
+            profile.depth[section] += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.depth[section] -= 1
+                if not profile.depth[section]:
+                    add(profile, time.perf_counter() - start)
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorator
+
+
+def _add_template(profile, seconds):
+    profile.template_seconds += seconds
+
+
+def _add_http(profile, seconds):
+    profile.http_seconds += seconds
+
+
+def _add_http_response(profile, seconds):
+    profile.http_count += 1
+    profile.http_seconds += seconds
+
+
+_patched = False
+
+
+def _patch():
+    # template rendering and http.client have no hooks, their methods are wrapped once per process
+    global _patched
+    if _patched:
+        return
+    _patched = True
+    template_base.Template.render = _timed('template', _add_template)(template_base.Template.render)
+    http.client.HTTPConnection.connect = _timed('http', _add_http)(http.client.HTTPConnection.connect)
+    http.client.HTTPConnection.getresponse = _timed('http', _add_http_response)(
+        http.client.HTTPConnection.getresponse)
+
+
+def _sql_wrapper(profile, path):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            profile.sql_count += 1
+            profile.sql_seconds += seconds
+            profile.statements[sql] += 1
+            if seconds * 1000 >= SLOW_QUERY_MS:
+                profile.slow_queries += 1
+                logger.warning('slow query (%.0f ms) in %s: %s', seconds * 1000, path, sql)
+    return wrapper
+
+
+class Stats:
+    # per view totals and a histogram of request times
+    FIELDS = ('requests', 'seconds', 'sql_queries', 'sql_seconds', 'slow_queries', 'template_seconds',
+              'http_requests', 'http_seconds', 'n_plus_one')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+
+    def add(self, view, seconds, profile, n_plus_one):
+        with self.lock:
+            totals = self.views[view]
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            totals['sql_queries'] += profile.sql_count
+            totals['sql_seconds'] += profile.sql_seconds
+            totals['slow_queries'] += profile.slow_queries
+            totals['template_seconds'] += profile.template_seconds
+            totals['http_requests'] += profile.http_count
+            totals['http_seconds'] += profile.http_seconds
+            totals['n_plus_one'] += n_plus_one
+            counts = self.buckets[view]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+
+    def prometheus(self):
+        def label(view):
+            return re.sub(r'(["\\])', r'\\\1', view).replace('\n', '\\n')
+
+        counters = (
+            ('sql_queries', 'django_sql_queries_total', 'SQL queries run'),
+            ('sql_seconds', 'django_sql_seconds_total', 'time spent in SQL queries'),
+            ('slow_queries', 'django_slow_queries_total', 'queries slower than {} ms'.format(SLOW_QUERY_MS)),
+            ('template_seconds', 'django_template_seconds_total', 'time spent rendering templates'),
+            ('http_requests', 'django_outbound_http_requests_total', 'outbound HTTP requests'),
+            ('http_seconds', 'django_outbound_http_seconds_total', 'time spent in outbound HTTP requests'),
+            ('n_plus_one', 'django_n_plus_one_total', 'requests that ran one statement {} or more times'.format(N_PLUS_ONE)),
+        )
+        with self.lock:
+            views = {view: dict(totals) for view, totals in self.views.items()}
+            buckets = {view: list(counts) for view, counts in self.buckets.items()}
+        lines = ['# HELP django_request_seconds wall time of requests',
+                 '# TYPE django_request_seconds histogram']
+        for view in sorted(views):
+            for bound, count in zip(BUCKETS, buckets[view]):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('django_request_seconds_bucket{{view="{}",le="{}"}} {}'.format(label(view), le, count))
+            lines.append('django_request_seconds_sum{{view="{}"}} {}'.format(label(view), views[view]['seconds']))
+            lines.append('django_request_seconds_count{{view="{}"}} {}'.format(label(view), views[view]['requests']))
+        for field, name, help_text in counters:
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} counter'.format(name))
+            for view in sorted(views):
+                lines.append('{}{{view="{}"}} {}'.format(name, label(view), views[view][field]))
+        return '\n'.join(lines) + '\n'
+
+
+stats = Stats()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        _patch()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        _local.profile = profile
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_sql_wrapper(profile, request.path)))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        seconds = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        repeated = [(sql, count) for sql, count in profile.statements.items() if count >= N_PLUS_ONE]
+        for sql, count in repeated:
+            logger.warning('possible N+1 in %s: %d x %s', view, count, sql)
+        stats.add(view, seconds, profile, 1 if repeated else 0)
+
+        response['Server-Timing'] = ', '.join((
+            'total;dur={:.1f}'.format(seconds * 1000),
+            'sql;dur={:.1f};desc="{} queries"'.format(profile.sql_seconds * 1000, profile.sql_count),
+            'tpl;dur={:.1f}'.format(profile.template_seconds * 1000),
+            'http;dur={:.1f};desc="{} calls"'.format(profile.http_seconds * 1000, profile.http_count),
+        ))
+        return response
+
+
+@staff_member_required
+def metrics(request):
+    # the totals of this process as Prometheus text
+    if not getattr(settings, 'REQUEST_PROFILING', False):
+        raise Http404('request profiling is off')
+    return HttpResponse(stats.prometheus(), content_type='text/plain; version=0.0.4')
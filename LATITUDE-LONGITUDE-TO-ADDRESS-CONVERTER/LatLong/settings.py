@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+from urllib.request import pathname2url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -40,7 +41,12 @@ INSTALLED_APPS = [
     'app'
 ]
 
+# REQUEST_PROFILING=1 turns on per-request timing of SQL, templates and outbound HTTP, with
+# slow query and N+1 logging and Prometheus totals at /__profile__/ (LatLong/profiling.py)
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+
 MIDDLEWARE = [
+    'LatLong.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,13 +80,32 @@ WSGI_APPLICATION = 'LatLong.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# SQLite tuned for several server processes (LatLong/sqlite_backend): WAL journal and the
+# pragmas in sqlite_backend/base.py on every connection, connections kept open for
+# CONN_MAX_AGE seconds, writers wait up to 20 s for the lock instead of failing with
+# "database is locked", and reads go to a second, read-only connection.
+
+DATABASE_PATH = os.path.join(BASE_DIR, 'db.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'ENGINE': 'LatLong.sqlite_backend',
+        'NAME': DATABASE_PATH,
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+    },
+    'read': {
+        'ENGINE': 'LatLong.sqlite_backend',
+        'NAME': 'file:{}?mode=ro'.format(pathname2url(DATABASE_PATH)),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+        'PRAGMAS': {'query_only': 1, 'cache_size': -20000, 'temp_store': 'MEMORY', 'mmap_size': 268435456},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['LatLong.sqlite_backend.router.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -126,4 +151,12 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR,"templates/static"),
-]
\ No newline at end of file
+]
+
+# slow queries and possible N+1 patterns found by the profiling middleware
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'LatLong.profiling': {'handlers': ['console'], 'level': 'WARNING'}},
+}
@@ -15,8 +15,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
+from LatLong import profiling
 
 urlpatterns = [
+    path('__profile__/', profiling.metrics, name='profile_metrics'),
     path('admin/', admin.site.urls),
     path('', include('app.urls')),
 ]
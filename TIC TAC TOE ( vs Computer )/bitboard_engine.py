@@ -0,0 +1,93 @@
+# Perfect play tic-tac-toe engine.
+# Each side is a 9 bit bitboard (bit i is square i, 0-8 left to right, top to bottom), a win is one
+# of 8 precomputed masks and the search is negamax with alpha-beta pruning and a transposition table.
+# The first moves, where the tree is largest, are taken from the solved table in opening_book.py.
+import opening_book
+
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,   # rows
+    0b001001001, 0b010010010, 0b100100100,   # columns
+    0b100010001, 0b001010100,                # diagonals
+)
+FULL = 0b111111111
+# centre, corners, edges: good moves first make alpha-beta cut off earlier
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+EXACT, LOWER, UPPER = 0, 1, 2
+# positions with at least this many empty squares are looked up in the opening book
+BOOK_MIN_EMPTY = 7
+
+def has_won(bits):
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+def to_bitboards(board, letter):
+    # (own, opponent) bitboards from a list of 9 'X' / 'O' / ' ' squares
+    own = opp = 0
+    for i, square in enumerate(board):
+        if square == letter:
+            own |= 1 << i
+        elif square != ' ':
+            opp |= 1 << i
+    return own, opp
+
+class Engine:
+    def __init__(self):
+        # (own, opp) -> (score, flag, best move); a position is keyed from the side to move
+        self.table = {}
+
+    def negamax(self, own, opp, alpha=-10, beta=10):
+        # score of the position for the side to move (own): 10 - plies for a win, so faster
+        # wins and slower losses are preferred, 0 for a draw
+        if has_won(opp):
+            return -10 + bin(own | opp).count('1'), None
+        if own | opp == FULL:
+            return 0, None
+        key = own << 9 | opp
+        entry = self.table.get(key)
+        if entry is not None:
+            score, flag, move = entry
+            if flag == EXACT:
+                return score, move
+            if flag == LOWER and score >= beta:
+                return score, move
+            if flag == UPPER and score <= alpha:
+                return score, move
+        original_alpha = alpha
+        best_score, best_move = -11, None
+        taken = own | opp
+        for move in MOVE_ORDER:
+            bit = 1 << move
+            if taken & bit:
+                continue
+            score = -self.negamax(opp, own | bit, -beta, -alpha)[0]
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (best_score, flag, best_move)
+        return best_score, best_move
+
+    def best_move(self, board, letter):
+        # index (0-8) of a perfect move for `letter` on a list board
+        if board.count(' ') >= BOOK_MIN_EMPTY:
+            move = opening_book.best_move(board, letter)
+            if move is not None:
+                return move
+        own, opp = to_bitboards(board, letter)
+        return self.negamax(own, opp)[1]
+
+# shared engine, its transposition table fills up over the games of a session
+engine = Engine()
+
+def best_move(board, letter):
+    return engine.best_move(board, letter)
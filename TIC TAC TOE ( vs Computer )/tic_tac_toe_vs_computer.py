@@ -1,4 +1,5 @@
 import  random
+import bitboard_engine
 board=list()
 move=1
 
@@ -107,6 +108,11 @@ def computermove(board,letter): #'O' for computer
         print("Computer's move5 (O) at position (1-9) : " + str(vacantplaces[i]+1))
         move=1
 
+def enginemove(board,letter): #perfect play from bitboard_engine, the opening moves come from its book
+    position=bitboard_engine.best_move(board,letter)
+    board[position]=letter
+    print("Computer's move (O) at position (1-9) : " + str(position+1))
+
 def isfull(board):
     if board.count(' ')>=1:
         return False
@@ -128,6 +134,11 @@ def main():
         option = int(input("Enter your choice: "))
         print()
         if option == 2:
+            print("Enter 1 for the normal computer")
+            print("Enter 2 for the unbeatable computer")
+            level = input("Enter your choice: ")
+            opponent = enginemove if level.strip() == '2' else computermove
+            print()
             board=createboard()
             while True:
                 displayBoard(board)
@@ -136,7 +147,7 @@ def main():
                         playermove(board,'X',1)
                         if not iswon(board):
                             if not isfull(board):
-                                computermove(board,'O')
+                                opponent(board,'O')
                             else:
                                 match_tie+=1
                                 print("Match Tie !")
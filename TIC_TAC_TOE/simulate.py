@@ -0,0 +1,199 @@
+# Headless self-play: plays many games between two policies on batches of NumPy boards, spread
+# over a process pool, and reports win/draw/loss rates and games per second.
+#
+#   python simulate.py --a heuristic --b random --games 1000000
+#
+# Policies:
+#   random     a random empty square (the tictactoe script)
+#   heuristic  the rules of computermove() in tic_tac_toe_vs_computer.py
+#   minimax    perfect play, looked up in the solved game table (opening_book.py)
+#
+# Boards are (games, 9) int8 arrays, 0 empty, 1 for the first player (X), 2 for the second (O).
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import opening_book
+
+LINES = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8], [0, 3, 6],
+                  [1, 4, 7], [2, 5, 8], [0, 4, 8], [2, 4, 6]])
+CORNERS = np.array([0, 2, 6, 8])
+POWERS = 3 ** np.arange(9)
+NO_MOVE = -1
+
+def random_choice(mask, rng):
+    # a random True column of every row, NO_MOVE for rows without one
+    scores = rng.random(mask.shape) * mask
+    choice = scores.argmax(axis=1)
+    return np.where(mask.any(axis=1), choice, NO_MOVE)
+
+def completing_cells(boards, player):
+    # (games, 9) squares that would give `player` three in a row
+    values = boards[:, LINES]
+    ready = ((values == player).sum(axis=2) == 2) & ((values == 0).sum(axis=2) == 1)
+    cells = np.zeros(boards.shape, dtype=bool)
+    rows = np.arange(len(boards))
+    for l, line in enumerate(LINES):
+        empty_at = line[(values[:, l] == 0).argmax(axis=1)]
+        hit = ready[:, l]
+        cells[rows[hit], empty_at[hit]] = True
+    return cells
+
+def random_policy(boards, player, rng):
+    return random_choice(boards == 0, rng)
+
+def heuristic_policy(boards, player, rng):
+    # computermove(): win, else block, else a few opening rules, else the centre, else random
+    opponent = 3 - player
+    empty = boards == 0
+    move = np.full(len(boards), NO_MOVE)
+    undecided = np.ones(len(boards), dtype=bool)
+
+    def take(candidates, first=True):
+        # first: the lowest square, as computermove scans the vacant places in order
+        has = undecided & candidates.any(axis=1)
+        chosen = candidates.argmax(axis=1) if first else random_choice(candidates, rng)
+        move[has] = chosen[has]
+        undecided[has] = False
+
+    take(completing_cells(boards, player))
+    take(completing_cells(boards, opponent))
+    # opponent holds opposite corners 0 and 8: an edge square 1 or 7
+    # (computermove raises an IndexError when both are taken, here the next rule is used instead)
+    edges = np.zeros(boards.shape, dtype=bool)
+    edges[:, [1, 7]] = empty[:, [1, 7]]
+    edges &= ((boards[:, 0] == opponent) & (boards[:, 8] == opponent))[:, None]
+    take(edges, first=False)
+    # opponent holds the centre: a free corner; computermove passes its turn when there is none
+    centre = undecided & (boards[:, 4] == opponent)
+    corners = np.zeros(boards.shape, dtype=bool)
+    corners[:, CORNERS] = empty[:, CORNERS]
+    corners &= centre[:, None]
+    take(corners, first=False)
+    undecided &= ~centre
+    take(empty & (np.arange(9) == 4))
+    take(empty, first=False)
+    return move
+
+_perfect_moves = None
+
+def _solve(squares, letter, memo):
+    # (score, move) for `letter` to move, scored like opening_book; for the positions the book does
+    # not hold, where the side to move is not the one the stone counts imply
+    key = (''.join(squares), letter)
+    if key not in memo:
+        other = 'O' if letter == 'X' else 'X'
+        if any(all(squares[i] == other for i in line) for line in LINES.tolist()):
+            result = (-10 + 9 - squares.count(' '), None)
+        elif ' ' not in squares:
+            result = (0, None)
+        else:
+            result = None
+            for move in range(9):
+                if squares[move] != ' ':
+                    continue
+                squares[move] = letter
+                score = -_solve(squares, other, memo)[0]
+                squares[move] = ' '
+                if result is None or score > result[0]:
+                    result = (score, move)
+        memo[key] = result
+    return memo[key]
+
+def perfect_table():
+    # perfect_table()[player - 1][board encoded in base 3]: best move of `player`, NO_MOVE for
+    # finished boards. The side to move is taken from the caller, not from the stone counts: a
+    # heuristic that passed its turn leaves boards where the counts point at the wrong side
+    global _perfect_moves
+    if _perfect_moves is None:
+        table = np.full((2, 3 ** 9), NO_MOVE, dtype=np.int8)
+        memo = {}
+        for code in range(3 ** 9):
+            squares = [' XO'[code // 3 ** i % 3] for i in range(9)]
+            if ' ' not in squares or any(len({squares[i] for i in line}) == 1 and squares[line[0]] != ' '
+                                         for line in LINES.tolist()):
+                continue
+            for side, letter in enumerate('XO'):
+                move = opening_book.best_move(squares, letter)
+                if move is None:
+                    move = _solve(squares, letter, memo)[1]
+                table[side, code] = move
+        _perfect_moves = table
+    return _perfect_moves
+
+def minimax_policy(boards, player, rng):
+    return perfect_table()[player - 1][boards.astype(np.int64) @ POWERS].astype(np.int64)
+
+POLICIES = {'random': random_policy, 'heuristic': heuristic_policy, 'minimax': minimax_policy}
+
+def play(first, second, games, rng):
+    # winners (0 draw, 1 first player, 2 second player) of `games` games played side by side
+    boards = np.zeros((games, 9), dtype=np.int8)
+    winner = np.zeros(games, dtype=np.int8)
+    active = np.ones(games, dtype=bool)
+    policies = (POLICIES[first], POLICIES[second])
+    ply = 0
+    while active.any():
+        player = ply % 2 + 1
+        idx = np.flatnonzero(active)
+        move = policies[ply % 2](boards[idx], player, rng)
+        moved = move != NO_MOVE
+        idx, move = idx[moved], move[moved]
+        boards[idx, move] = player
+        won = (boards[idx][:, LINES] == player).all(axis=2).any(axis=1)
+        winner[idx[won]] = player
+        active[idx[won]] = False
+        active &= (boards == 0).any(axis=1)
+        ply += 1
+    return winner
+
+def run_chunk(args):
+    a, b, games, batch, seed = args
+    rng = np.random.default_rng(seed)
+    # counts[side][result]: side 0 = a plays X, 1 = a plays O; result 0 a wins, 1 draw, 2 a loses
+    counts = np.zeros((2, 3), dtype=np.int64)
+    done = 0
+    while done < games:
+        n = min(batch, games - done)
+        half = n // 2
+        w = play(a, b, n - half, rng)
+        counts[0] += [(w == 1).sum(), (w == 0).sum(), (w == 2).sum()]
+        w = play(b, a, half, rng)
+        counts[1] += [(w == 2).sum(), (w == 0).sum(), (w == 1).sum()]
+        done += n
+    return counts
+
+def simulate(a, b, games, workers=None, batch=65536, seed=0):
+    chunks = max(1, min(games // batch, (workers or 4) * 4))
+    sizes = [games // chunks + (i < games % chunks) for i in range(chunks)]
+    jobs = [(a, b, size, batch, seed + i) for i, size in enumerate(sizes)]
+    if workers == 1:
+        return sum(map(run_chunk, jobs))
+    with ProcessPoolExecutor(workers) as pool:
+        return sum(pool.map(run_chunk, jobs))
+
+def main():
+    parser = argparse.ArgumentParser(description='play tic-tac-toe policies against each other')
+    parser.add_argument('--a', default='heuristic', choices=POLICIES)
+    parser.add_argument('--b', default='random', choices=POLICIES)
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, help='processes, defaults to the number of CPUs')
+    parser.add_argument('--batch', type=int, default=65536, help='games played side by side in one array')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.a == 'minimax' or args.b == 'minimax':
+        perfect_table()  # build once before forking
+    start = time.perf_counter()
+    counts = simulate(args.a, args.b, args.games, args.workers, args.batch, args.seed)
+    seconds = time.perf_counter() - start
+
+    print('{} vs {}, {} games'.format(args.a, args.b, args.games))
+    for label, row in (('{} as X'.format(args.a), counts[0]), ('{} as O'.format(args.a), counts[1]),
+                       ('total', counts.sum(axis=0))):
+        total = max(row.sum(), 1)
+        print('{:>16}: win {:6.2%}  draw {:6.2%}  loss {:6.2%}'.format(label, *(row / total)))
+    print('{:>16}: {:,.0f} games/s ({:.2f} s)'.format('speed', args.games / seconds, seconds))
+
+if __name__ == '__main__':
+    main()
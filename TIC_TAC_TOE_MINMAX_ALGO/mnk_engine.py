@@ -0,0 +1,288 @@
+# m,n,k-game engine: an m x n board where k in a row wins (3,3,3 is tic-tac-toe, 15,15,5 is gomoku).
+#
+# The board keeps, for every line of k cells ("window"), how many stones each player has in it. A move
+# only touches the windows through its own cell, so win detection and the evaluation are updated
+# incrementally around the last move. The search is negamax with alpha-beta, iterative deepening
+# under a time budget, move ordering (transposition table move, history heuristic, local threat
+# value) and a fixed size Zobrist-hashed transposition table.
+#
+#   board = Board(15, 15, 5)
+#   board.play(board.cell(7, 7))
+#   row, col = board.coords(Engine().best_move(board, time_limit=1.0))
+import time
+import random
+
+WIN = 10 ** 9
+# scores within MAX_PLIES of WIN are wins or losses, a game never lasts longer than that
+MAX_PLIES = 1 << 16
+EXACT, LOWER, UPPER = 0, 1, 2
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+class Board:
+    def __init__(self, m=3, n=3, k=3, seed=0):
+        self.m, self.n, self.k = m, n, k
+        self.size = m * n
+        self.cells = [0] * self.size          # 0 empty, 1 first player, -1 second player
+        self.to_move = 1
+        self.moves = []
+        self.winner = 0
+        # every line of k cells and the windows each cell belongs to
+        self.windows = []
+        for r in range(m):
+            for c in range(n):
+                for dr, dc in DIRECTIONS:
+                    end_r, end_c = r + dr * (k - 1), c + dc * (k - 1)
+                    if 0 <= end_r < m and 0 <= end_c < n:
+                        self.windows.append([(r + dr * i) * n + c + dc * i for i in range(k)])
+        self.cell_windows = [[] for _ in range(self.size)]
+        for w, cells in enumerate(self.windows):
+            for cell in cells:
+                self.cell_windows[cell].append(w)
+        # stones of player 1 / player -1 in every window
+        self.first = [0] * len(self.windows)
+        self.second = [0] * len(self.windows)
+        # a window with stones of one player only is worth weight[stones] to that player
+        self.weight = [0] + [4 ** i for i in range(1, k)] + [WIN]
+        self.score = 0                        # evaluation from player 1's point of view
+        # Zobrist keys, one per cell and player
+        rng = random.Random(seed)
+        self.zobrist = [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(self.size)]
+        self.side_key = rng.getrandbits(64)
+        self.hash = 0
+        # number of stones within 2 cells of every cell; on large boards only those cells are searched
+        self.near = [0] * self.size
+        self.radius = 2
+        self.neighbours = []
+        for cell in range(self.size):
+            r, c = divmod(cell, n)
+            self.neighbours.append([rr * n + cc
+                                    for rr in range(max(0, r - self.radius), min(m, r + self.radius + 1))
+                                    for cc in range(max(0, c - self.radius), min(n, c + self.radius + 1))
+                                    if (rr, cc) != (r, c)])
+
+    def cell(self, row, col):
+        return row * self.n + col
+
+    def coords(self, cell):
+        return divmod(cell, self.n)
+
+    def _value(self, w):
+        a, b = self.first[w], self.second[w]
+        if a and b:
+            return 0
+        return self.weight[a] - self.weight[b]
+
+    def play(self, cell):
+        player = self.to_move
+        if self.cells[cell] or self.winner:
+            raise ValueError('illegal move {}'.format(self.coords(cell)))
+        counts = self.first if player == 1 else self.second
+        for w in self.cell_windows[cell]:
+            before = self._value(w)
+            counts[w] += 1
+            self.score += self._value(w) - before
+            if counts[w] == self.k:
+                self.winner = player
+        self.cells[cell] = player
+        self.hash ^= self.zobrist[cell][player == -1] ^ self.side_key
+        for other in self.neighbours[cell]:
+            self.near[other] += 1
+        self.moves.append(cell)
+        self.to_move = -player
+
+    def undo(self):
+        cell = self.moves.pop()
+        player = -self.to_move
+        counts = self.first if player == 1 else self.second
+        for w in self.cell_windows[cell]:
+            before = self._value(w)
+            counts[w] -= 1
+            self.score += self._value(w) - before
+        self.winner = 0
+        self.cells[cell] = 0
+        self.hash ^= self.zobrist[cell][player == -1] ^ self.side_key
+        for other in self.neighbours[cell]:
+            self.near[other] -= 1
+        self.to_move = player
+
+    def full(self):
+        return len(self.moves) == self.size
+
+    def candidates(self):
+        # every empty cell on small boards, otherwise the empty cells near a stone
+        if self.size <= 25:
+            return [c for c in range(self.size) if not self.cells[c]]
+        if not self.moves:
+            return [self.cell(self.m // 2, self.n // 2)]
+        return [c for c in range(self.size) if not self.cells[c] and self.near[c]]
+
+    def local_value(self, cell):
+        # how much the windows through an empty cell are worth to either side, for move ordering
+        total = 0
+        for w in self.cell_windows[cell]:
+            a, b = self.first[w], self.second[w]
+            if not b:
+                total += self.weight[a]
+            if not a:
+                total += self.weight[b]
+        return total
+
+    def __str__(self):
+        marks = {0: '.', 1: 'X', -1: 'O'}
+        return '\n'.join(' '.join(marks[self.cells[r * self.n + c]] for c in range(self.n)) for r in range(self.m))
+
+class TimeUp(Exception):
+    pass
+
+class TranspositionTable:
+    # fixed number of slots indexed by the low bits of the Zobrist hash; a slot is replaced when it
+    # is empty, was written by an older search, or the new entry was searched at least as deep.
+    # Win and loss scores count plies from the root (WIN - ply); they are stored as plies from the
+    # position itself, so a hit reached at another ply still reports the right distance to the win
+    def __init__(self, bits=20):
+        self.mask = (1 << bits) - 1
+        self.slots = [None] * (1 << bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key, ply=0):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            score = entry[2]
+            if score > WIN - MAX_PLIES:
+                score -= ply
+            elif score < -WIN + MAX_PLIES:
+                score += ply
+            return entry[:2] + (score,) + entry[3:]
+        return None
+
+    def put(self, key, depth, score, flag, move, ply=0):
+        i = key & self.mask
+        old = self.slots[i]
+        if old is None or old[5] != self.generation or depth >= old[1]:
+            if score > WIN - MAX_PLIES:
+                score += ply
+            elif score < -WIN + MAX_PLIES:
+                score -= ply
+            self.slots[i] = (key, depth, score, flag, move, self.generation)
+
+class Engine:
+    def __init__(self, table_bits=20):
+        self.table = TranspositionTable(table_bits)
+        self.history = {}
+        self.nodes = 0
+
+    def order(self, board, moves, tt_move):
+        history = self.history
+        moves.sort(key=lambda c: (c == tt_move, history.get(c, 0) + board.local_value(c)), reverse=True)
+        return moves
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        # a clock read costs far less than ordering the moves of one node, so every node checks it
+        if time.perf_counter() > self.deadline:
+            raise TimeUp
+        if board.winner:
+            # the previous move won
+            return -(WIN - ply)
+        if board.full():
+            return 0
+        if depth == 0:
+            return board.score * board.to_move
+
+        original_alpha = alpha
+        entry = self.table.get(board.hash, ply)
+        tt_move = None
+        if entry is not None:
+            _, entry_depth, score, flag, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                elif flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        best_score, best_move = -WIN - 1, None
+        for move in self.order(board, board.candidates(), tt_move):
+            board.play(move)
+            try:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.undo()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[move] = self.history.get(move, 0) + depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.put(board.hash, depth, best_score, flag, best_move, ply)
+        return best_score
+
+    def best_move(self, board, time_limit=1.0, max_depth=None):
+        # deepens one ply at a time until the time budget runs out, returns the best move of the
+        # deepest finished iteration
+        self.deadline = time.perf_counter() + time_limit
+        self.table.new_search()
+        self.history = {}
+        self.nodes = 0
+        self.depth = 0
+        moves = board.candidates()
+        best = moves[0]
+        max_depth = max_depth or board.size - len(board.moves)
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self.negamax(board, depth, -WIN - 1, WIN + 1, 0)
+            except TimeUp:
+                break
+            entry = self.table.get(board.hash)
+            if entry is not None and entry[4] is not None:
+                best = entry[4]
+            self.depth = depth
+            if abs(score) >= WIN - board.size:
+                # forced win or loss found, deeper search cannot change it
+                break
+        return best
+
+def play_cli(m=3, n=3, k=3, time_limit=1.0):
+    # human (X) against the engine (O) in the terminal
+    board = Board(m, n, k)
+    engine = Engine()
+    while not board.winner and not board.full():
+        print(board)
+        if board.to_move == 1:
+            try:
+                row, col = (int(x) - 1 for x in input('your move, row and column (1-based): ').split())
+                if not (0 <= row < m and 0 <= col < n):
+                    raise ValueError
+                board.play(board.cell(row, col))
+            except ValueError:
+                print('invalid move')
+        else:
+            move = engine.best_move(board, time_limit)
+            print('engine plays {} {} (depth {}, {} nodes)'.format(*(x + 1 for x in board.coords(move)), engine.depth, engine.nodes))
+            board.play(move)
+    print(board)
+    print({1: 'X wins', -1: 'O wins', 0: 'draw'}[board.winner])
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='play an m,n,k-game against the engine')
+    parser.add_argument('-m', type=int, default=3)
+    parser.add_argument('-n', type=int, default=3)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--time', type=float, default=1.0, help='seconds per engine move')
+    args = parser.parse_args()
+    play_cli(args.m, args.n, args.k, args.time)
@@ -0,0 +1,158 @@
+# Solved 3x3 tic-tac-toe: a perfect move and the game theoretic value of every reachable position.
+#
+# `python opening_book.py` enumerates all reachable positions once, keeps one position per class of
+# the 8 board symmetries, solves them and writes opening_book.bin. At play time best_move() and
+# value() map the board to its canonical form and look it up in a dict, O(1) per move.
+#
+# Squares are numbered 0-8, left to right and top to bottom. File format: b'TTT1', a little endian
+# uint16 count, then per position a uint32 key (first player bits | second player bits << 9), a
+# uint8 move in the canonical orientation and an int8 value (1 win, 0 draw, -1 loss for the side to move).
+import os
+import struct
+
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+MAGIC = b'TTT1'
+RECORD = struct.Struct('<IBb')
+
+WIN_MASKS = (0b000000111, 0b000111000, 0b111000000, 0b001001001,
+             0b010010010, 0b100100100, 0b100010001, 0b001010100)
+
+def _symmetries():
+    # the 8 symmetries of the square as permutations: SYMMETRIES[s][i] is where square i goes
+    perms = []
+    for turns in range(4):
+        for mirror in (False, True):
+            dest = []
+            for i in range(9):
+                r, c = divmod(i, 3)
+                if mirror:
+                    c = 2 - c
+                for _ in range(turns):
+                    r, c = c, 2 - r   # quarter turn clockwise
+                dest.append(3 * r + c)
+            perms.append(dest)
+    return perms
+
+SYMMETRIES = _symmetries()
+# MAPS[s][bits] is the bitboard `bits` transformed by symmetry s
+MAPS = [[sum(1 << dest[i] for i in range(9) if bits >> i & 1) for bits in range(512)] for dest in SYMMETRIES]
+
+def has_won(bits):
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+def canonical(first, second):
+    # (key, symmetry) of the smallest transformed key
+    return min((MAPS[s][first] | MAPS[s][second] << 9, s) for s in range(8))
+
+def _solve(first, second, memo):
+    # (score, move) for the side to move, which holds `first` when both have as many stones;
+    # a win scores 10 - stones on the board so faster wins are preferred
+    key = first | second << 9
+    if key in memo:
+        return memo[key]
+    first_to_move = bin(first).count('1') == bin(second).count('1')
+    taken = first | second
+    if has_won(second if first_to_move else first):
+        result = (-10 + bin(taken).count('1'), None)
+    elif taken == 0b111111111:
+        result = (0, None)
+    else:
+        result = None
+        for move in range(9):
+            if taken >> move & 1:
+                continue
+            if first_to_move:
+                score = -_solve(first | 1 << move, second, memo)[0]
+            else:
+                score = -_solve(first, second | 1 << move, memo)[0]
+            if result is None or score > result[0]:
+                result = (score, move)
+    memo[key] = result
+    return result
+
+def generate():
+    # {canonical key: (move, value)} for every reachable position that is not over yet
+    memo = {}
+    book = {}
+    seen = set()
+    stack = [(0, 0)]
+    while stack:
+        first, second = stack.pop()
+        key, s = canonical(first, second)
+        if key in seen:
+            continue
+        seen.add(key)
+        cf, cs = key & 0b111111111, key >> 9
+        if has_won(cf) or has_won(cs) or cf | cs == 0b111111111:
+            continue
+        score, move = _solve(cf, cs, memo)
+        book[key] = (move, (score > 0) - (score < 0))
+        first_to_move = bin(cf).count('1') == bin(cs).count('1')
+        for m in range(9):
+            if not (cf | cs) >> m & 1:
+                stack.append((cf | 1 << m, cs) if first_to_move else (cf, cs | 1 << m))
+    return book
+
+def save(book, path=BOOK_FILE):
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<H', len(book)))
+        for key in sorted(book):
+            move, value = book[key]
+            f.write(RECORD.pack(key, move, value))
+
+def load(path=BOOK_FILE):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError('{} is not an opening book'.format(path))
+    count, = struct.unpack_from('<H', data, 4)
+    return {key: (move, value) for key, move, value in RECORD.iter_unpack(data[6:6 + count * RECORD.size])}
+
+_book = None
+
+def book():
+    # loaded on first use, generated (and saved) if the file is missing
+    global _book
+    if _book is None:
+        try:
+            _book = load()
+        except OSError:
+            _book = generate()
+            try:
+                save(_book)
+            except OSError:
+                pass
+    return _book
+
+def _lookup(board, letter):
+    # board: 9 squares of 'X' / 'O' / ' ', letter: the side to move
+    own = opp = 0
+    for i, square in enumerate(board):
+        if square == letter:
+            own |= 1 << i
+        elif square != ' ':
+            opp |= 1 << i
+    # the side to move started the game when both have as many stones
+    first, second = (own, opp) if bin(own).count('1') == bin(opp).count('1') else (opp, own)
+    key, s = canonical(first, second)
+    return book().get(key), s
+
+def best_move(board, letter):
+    # index 0-8 of a perfect move, None when the game is over
+    entry, s = _lookup(board, letter)
+    if entry is None:
+        return None
+    return SYMMETRIES[s].index(entry[0])
+
+def value(board, letter):
+    # 1 if `letter` (to move) wins with perfect play, 0 for a draw, -1 for a loss; None when the game is over
+    entry, _ = _lookup(board, letter)
+    return None if entry is None else entry[1]
+
+if __name__ == '__main__':
+    book_ = generate()
+    save(book_)
+    print('wrote {} positions to {} ({} bytes)'.format(len(book_), BOOK_FILE, os.path.getsize(BOOK_FILE)))
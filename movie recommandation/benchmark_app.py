@@ -0,0 +1,231 @@
+# load test of the movie recommender: starts the app on a synthetic catalogue with a stub IMDB
+# server and stub sentiment model, drives a concurrent request mix and reports latency percentiles,
+# throughput, startup time and memory
+#
+#   python benchmark_app.py --movies 20000 --requests 2000 --concurrency 16
+#   python benchmark_app.py --json results.json      (machine readable output for CI)
+import os
+import sys
+import json
+import time
+import random
+import pickle
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import requests
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS = ['action', 'drama', 'comedy', 'thriller', 'romance', 'horror', 'sci-fi', 'crime', 'war', 'family',
+         'western', 'music', 'history', 'sport', 'mystery', 'fantasy', 'animation', 'biography']
+GOOD = ['great', 'wonderful', 'loved', 'brilliant', 'moving', 'fun']
+BAD = ['boring', 'awful', 'hated', 'dull', 'terrible', 'slow']
+
+# started inside the working directory so the app picks up the synthetic data and stub models
+SERVER = '''
+import os, sys
+sys.path.insert(0, {app_dir!r})
+from werkzeug.serving import run_simple
+import main
+if not os.path.isdir(os.path.join(main.app.root_path, 'templates')):
+    main.app.template_folder = os.path.abspath('templates')
+run_simple('127.0.0.1', {port}, main.app, threaded=True)
+'''
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def write_catalogue(path, movies, seed=0):
+    rng = random.Random(seed)
+    people = ['person{}'.format(i) for i in range(max(movies // 5, 10))]
+    rows = []
+    for i in range(movies):
+        comb = ' '.join(rng.sample(people, 4) + rng.sample(WORDS, 3) + [rng.choice(people)])
+        rows.append({'movie_title': 'movie {}'.format(i), 'comb': comb})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+def write_models(workdir, seed=0):
+    # a real but tiny tfidf + naive bayes pair stands in for nlp_model.pkl / tranform.pkl
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(500):
+        label = rng.random() < 0.5
+        texts.append(' '.join(rng.choices(GOOD if label else BAD, k=5) + rng.choices(WORDS, k=5)))
+        labels.append(int(label))
+    vectorizer = TfidfVectorizer()
+    clf = MultinomialNB().fit(vectorizer.fit_transform(texts), labels)
+    with open(os.path.join(workdir, 'nlp_model.pkl'), 'wb') as f:
+        pickle.dump(clf, f)
+    with open(os.path.join(workdir, 'tranform.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+
+def write_templates(workdir):
+    os.makedirs(os.path.join(workdir, 'templates'), exist_ok=True)
+    with open(os.path.join(workdir, 'templates', 'home.html'), 'w') as f:
+        f.write('<html><body>home</body></html>')
+    with open(os.path.join(workdir, 'templates', 'recommend.html'), 'w') as f:
+        f.write('<html><body>{{ title }}{% for r, s in reviews.items() %}<p>{{ r }} {{ s }}</p>{% endfor %}'
+                '{% for n, c in casts.items() %}<p>{{ n }} {{ c[1] }}</p>{% endfor %}</body></html>')
+
+def start_imdb_stub(reviews_per_page=25, delay=0.05, seed=0):
+    rng = random.Random(seed)
+    page = ''.join('<div class="text show-more__control">{}</div>'.format(
+        ' '.join(rng.choices(GOOD + BAD + WORDS, k=30))) for _ in range(reviews_per_page))
+    body = '<html><body>{}</body></html>'.format(page).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)  # pretend to be a remote site
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def rss_mb(pid):
+    # resident memory of the server process, Linux only
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+def recommend_form(i, imdb_titles):
+    names = ['actor {}'.format(j) for j in range(8)]
+    as_list = lambda values: '["' + '","'.join(values) + '"]'
+    return {
+        'title': 'movie {}'.format(i), 'imdb_id': 'tt{:07d}'.format(i % imdb_titles),
+        'cast_ids': '[' + ','.join(str(j) for j in range(8)) + ']', 'cast_names': as_list(names),
+        'cast_chars': as_list(names), 'cast_bdays': as_list(['1970-01-01'] * 8), 'cast_bios': as_list(['bio'] * 8),
+        'cast_places': as_list(['earth'] * 8), 'cast_profiles': as_list(['p{}.jpg'.format(j) for j in range(8)]),
+        'poster': 'poster.jpg', 'genres': 'Drama', 'overview': 'overview', 'rating': '7.1', 'vote_count': '100',
+        'release_date': '2000-01-01', 'runtime': '120', 'status': 'Released',
+        'rec_movies': as_list(['movie {}'.format(j) for j in range(10)]),
+        'rec_posters': as_list(['r{}.jpg'.format(j) for j in range(10)]),
+    }
+
+def make_requests(n, movies, imdb_titles, mix, seed=0):
+    rng = random.Random(seed)
+    endpoints, weights = zip(*mix.items())
+    plan = []
+    for _ in range(n):
+        endpoint = rng.choices(endpoints, weights)[0]
+        i = rng.randrange(movies)
+        if endpoint == 'home':
+            plan.append(('home', 'GET', '/', None))
+        elif endpoint == 'similarity':
+            plan.append(('similarity', 'POST', '/similarity', {'name': 'movie {}'.format(i)}))
+        elif endpoint == 'suggest':
+            plan.append(('suggest', 'GET', '/suggest?q=movie+{}'.format(i // 10), None))
+        else:
+            plan.append(('recommend', 'POST', '/recommend', recommend_form(i, imdb_titles)))
+    return plan
+
+def main():
+    parser = argparse.ArgumentParser(description='load test the movie recommender')
+    parser.add_argument('--movies', type=int, default=5000, help='size of the synthetic catalogue')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--imdb-titles', type=int, default=50, help='distinct titles hit on /recommend')
+    parser.add_argument('--imdb-delay', type=float, default=0.05, help='seconds the stub IMDB takes per page')
+    parser.add_argument('--mix', default='home=1,similarity=5,suggest=5,recommend=2')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    mix = {k: float(v) for k, v in (item.split('=') for item in args.mix.split(','))}
+
+    # synthetic data, models and the server log, removed once the app has stopped
+    with tempfile.TemporaryDirectory(prefix='recommender-bench-') as workdir:
+        write_catalogue(os.path.join(workdir, 'main_data.csv'), args.movies)
+        write_models(workdir)
+        write_templates(workdir)
+        imdb = start_imdb_stub(delay=args.imdb_delay)
+
+        port = free_port()
+        env = dict(os.environ, IMDB_BASE_URL='http://127.0.0.1:{}'.format(imdb.server_address[1]))
+        script = SERVER.format(app_dir=APP_DIR, port=port)
+        start = time.perf_counter()
+        log = open(os.path.join(workdir, 'server.log'), 'w+')
+        server = subprocess.Popen([sys.executable, '-c', script], cwd=workdir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=log)
+        base = 'http://127.0.0.1:{}'.format(port)
+        try:
+            while True:
+                if server.poll() is not None:
+                    log.seek(0)
+                    sys.exit('the app exited during startup:\n' + log.read()[-4000:])
+                try:
+                    requests.get(base + '/suggest?q=a', timeout=1)
+                    break
+                except requests.RequestException:
+                    time.sleep(0.05)
+            startup = time.perf_counter() - start
+            rss_start = rss_mb(server.pid)
+
+            local = threading.local()
+            def send(item):
+                name, method, path, form = item
+                if not hasattr(local, 'session'):
+                    local.session = requests.Session()
+                t = time.perf_counter()
+                try:
+                    ok = local.session.request(method, base + path, data=form, timeout=30).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                return name, time.perf_counter() - t, ok
+
+            plan = make_requests(args.requests, args.movies, args.imdb_titles, mix)
+            t = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                results = list(pool.map(send, plan))
+            wall = time.perf_counter() - t
+            rss_end = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+            log.close()
+            imdb.shutdown()
+
+    rows = []
+    for name in mix:
+        times = np.array([d for n, d, _ in results if n == name]) * 1000
+        if not len(times):
+            continue
+        rows.append({
+            'endpoint': name, 'requests': len(times), 'errors': sum(1 for n, _, ok in results if n == name and not ok),
+            'p50_ms': round(float(np.percentile(times, 50)), 2), 'p95_ms': round(float(np.percentile(times, 95)), 2),
+            'p99_ms': round(float(np.percentile(times, 99)), 2),
+        })
+    summary = {
+        'movies': args.movies, 'concurrency': args.concurrency, 'startup_s': round(startup, 3),
+        'throughput_rps': round(len(results) / wall, 1),
+        'rss_start_mb': rss_start and round(rss_start, 1), 'rss_end_mb': rss_end and round(rss_end, 1),
+    }
+    print(pd.DataFrame(rows).to_string(index=False))
+    print()
+    for key, value in summary.items():
+        print('{:>16}: {}'.format(key, value))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'endpoints': rows}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
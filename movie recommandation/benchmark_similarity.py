@@ -0,0 +1,70 @@
+# recall vs latency of the similarity engines, measured against the exact results of the
+# original dense count-vector cosine matrix
+#
+#   python benchmark_similarity.py --csv main_data.csv -k 10 --queries 500
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from similarity import ENGINES, create_engine
+
+def real_neighbours(ids, scores):
+    # the neighbour ids of every title without the padding of short rows (id 0, score -inf),
+    # which would otherwise count as a hit whenever title 0 is a real neighbour
+    return [row_ids[row_scores > -np.inf] for row_ids, row_scores in zip(ids, scores)]
+
+def recall(found, reference):
+    # fraction of the reference neighbours an engine also returned, averaged over all titles;
+    # both are real_neighbours() lists
+    hits = [len(set(f) & set(r)) / len(r) for f, r in zip(found, reference) if len(r)]
+    return float(np.mean(hits)) if hits else 0.0
+
+def run(name, texts, k, queries, reference=None):
+    start = time.perf_counter()
+    engine = create_engine(name).fit(texts)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids, scores = engine.neighbours(k)
+    build_time = time.perf_counter() - start
+    found = real_neighbours(ids, scores)
+
+    latencies = []
+    for i in queries:
+        start = time.perf_counter()
+        engine.query(int(i), k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    return found, {
+        'engine': name,
+        'fit_s': round(fit_time, 3),
+        'all_neighbours_s': round(build_time, 3),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'query_p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'recall@{}'.format(k): None if reference is None else round(recall(found, reference), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='recall vs latency of the similarity engines')
+    parser.add_argument('--csv', default='main_data.csv')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500, help='number of single title queries to time')
+    parser.add_argument('--engines', default=','.join(ENGINES))
+    parser.add_argument('--reference', default='dense', help="engine whose results count as ground truth ('count' gives the same results as 'dense' without the N x N matrix)")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.csv)['comb']
+    rng = np.random.default_rng(0)
+    queries = rng.choice(len(texts), size=min(args.queries, len(texts)), replace=False)
+
+    reference, row = run(args.reference, texts, args.k, queries)
+    rows = [row]
+    for name in args.engines.split(','):
+        if name != args.reference:
+            rows.append(run(name, texts, args.k, queries, reference)[1])
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+# Compact, array backed serving format for fitted scikit-learn models.
+#
+# A model is exported once to a directory holding meta.json and one .npy file per array. Loading
+# only reads meta.json; the arrays are memory mapped on the first predict, so start up is instant,
+# scikit-learn is not imported, and every worker that opens the same files shares their pages.
+#
+#   python compact_model.py export model.pkl model              write the compact copy of model.pkl
+#   python compact_model.py check model.pkl model               compare predictions with the pickle
+#   python compact_model.py benchmark model.pkl model           cold start time and memory of both
+#
+# Supported: linear models (LinearRegression, Ridge, Lasso, LogisticRegression, LinearSVC, ...),
+# MultinomialNB, binary SVC, decision trees and random/extra trees forests (one output).
+import os
+import sys
+import json
+import numpy as np
+
+META_FILE = 'meta.json'
+# ensembles whose prediction is the average of their trees (not eg. IsolationForest or boosting)
+FORESTS = ('RandomForestRegressor', 'RandomForestClassifier', 'ExtraTreesRegressor', 'ExtraTreesClassifier')
+TREES = ('DecisionTreeRegressor', 'DecisionTreeClassifier', 'ExtraTreeRegressor', 'ExtraTreeClassifier')
+
+def _tree_arrays(trees):
+    # all trees of an ensemble as one flat node table, children ids shifted by each tree's offset
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        roots.append(offset)
+        is_leaf = t.children_left == -1
+        left.append(np.where(is_leaf, -1, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(t.threshold)
+        if t.value.shape[1] != 1:
+            raise ValueError('only single output trees are supported')
+        v = t.value[:, 0, :]
+        if v.shape[1] > 1:
+            # class counts (or fractions) -> per tree probabilities, as predict_proba does
+            v = v / v.sum(axis=1, keepdims=True)
+        value.append(v)
+        offset += t.node_count
+    return {
+        'left': np.concatenate(left).astype(np.int32), 'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int32), 'threshold': np.concatenate(threshold),
+        'value': np.concatenate(value), 'roots': np.array(roots, dtype=np.int32),
+    }
+
+def to_arrays(model):
+    # (kind, params, arrays) describing a fitted model
+    name = type(model).__name__
+    params = {'model': name}
+    arrays = {}
+    if hasattr(model, 'classes_'):
+        arrays['classes'] = np.asarray(model.classes_)
+    if name in FORESTS:
+        kind = 'trees'
+        arrays.update(_tree_arrays(model.estimators_))
+    elif name in TREES:
+        kind = 'trees'
+        arrays.update(_tree_arrays([model]))
+    elif name == 'MultinomialNB':
+        kind = 'naive_bayes'
+        arrays['feature_log_prob'] = model.feature_log_prob_
+        arrays['class_log_prior'] = model.class_log_prior_
+    elif name == 'SVC':
+        kind = 'svc'
+        if len(model.classes_) != 2:
+            raise ValueError('only binary SVC models are supported')
+        arrays['support_vectors'] = np.asarray(model.support_vectors_)
+        arrays['dual_coef'] = np.asarray(model.dual_coef_).ravel()
+        arrays['intercept'] = np.asarray(model.intercept_)
+        params.update(kernel=model.kernel, gamma=float(model._gamma), coef0=float(model.coef0), degree=int(model.degree))
+        if callable(model.kernel) or model.kernel == 'precomputed':
+            raise ValueError('only the built in SVC kernels are supported')
+    elif hasattr(model, 'coef_'):
+        kind = 'linear'
+        arrays['coef'] = np.asarray(model.coef_)
+        arrays['intercept'] = np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64))
+    else:
+        raise ValueError('{} models are not supported'.format(name))
+    if hasattr(model, 'n_features_in_'):
+        params['n_features'] = int(model.n_features_in_)
+    params['kind'] = kind
+    return params, arrays
+
+def export(model, out_dir):
+    params, arrays = to_arrays(model)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in arrays.items():
+        if array.dtype == object:
+            # eg. string class labels, stored as fixed width unicode so they can be memory mapped
+            array = array.astype(str)
+        np.save(os.path.join(out_dir, name + '.npy'), array)
+    params['arrays'] = sorted(arrays)
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump(params, f, indent=2)
+    return params
+
+class CompactModel:
+    # predict() compatible stand in for the exported model, pure NumPy
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        with open(os.path.join(model_dir, META_FILE)) as f:
+            self.params = json.load(f)
+        self.kind = self.params['kind']
+        self._arrays = None
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = {name: np.load(os.path.join(self.model_dir, name + '.npy'), mmap_mode='r')
+                            for name in self.params['arrays']}
+        return self._arrays
+
+    def _classify(self, scores):
+        classes = self.arrays['classes']
+        if scores.ndim == 1 or scores.shape[1] == 1:
+            return classes[(np.ravel(scores) > 0).astype(int)]
+        return classes[np.argmax(scores, axis=1)]
+
+    def _kernel(self, X):
+        p = self.params
+        sv = self.arrays['support_vectors']
+        if p['kernel'] == 'linear':
+            return X @ sv.T
+        if p['kernel'] == 'rbf':
+            X = _dense(X)
+            sq = (X ** 2).sum(axis=1)[:, None] + (sv ** 2).sum(axis=1)[None, :] - 2 * (X @ sv.T)
+            return np.exp(-p['gamma'] * np.maximum(sq, 0))
+        if p['kernel'] == 'poly':
+            return (p['gamma'] * (X @ sv.T) + p['coef0']) ** p['degree']
+        if p['kernel'] == 'sigmoid':
+            return np.tanh(p['gamma'] * (X @ sv.T) + p['coef0'])
+        raise ValueError('unknown kernel {}'.format(p['kernel']))
+
+    def _tree_values(self, X):
+        a = self.arrays
+        # trees compare float32 features against float64 thresholds, like scikit-learn
+        X = _dense(X).astype(np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(a['roots'], (X.shape[0], len(a['roots']))).copy()
+        while True:
+            left = a['left'][node]
+            active = left != -1
+            if not active.any():
+                break
+            go_left = X[rows, a['feature'][node]] <= a['threshold'][node]
+            node = np.where(active, np.where(go_left, left, a['right'][node]), node)
+        # (samples, trees, outputs) averaged over the trees
+        return a['value'][node].mean(axis=1)
+
+    def decision_function(self, X):
+        a = self.arrays
+        if self.kind == 'linear':
+            return X @ np.asarray(a['coef']).T + a['intercept']
+        if self.kind == 'naive_bayes':
+            return X @ np.asarray(a['feature_log_prob']).T + a['class_log_prior']
+        if self.kind == 'svc':
+            return self._kernel(X) @ a['dual_coef'] + a['intercept'][0]
+        raise ValueError('{} models have no decision function'.format(self.kind))
+
+    def predict(self, X):
+        if self.kind == 'trees':
+            values = self._tree_values(X)
+            if 'classes' in self.arrays:
+                return self.arrays['classes'][np.argmax(values, axis=1)]
+            return values[:, 0]
+        scores = np.asarray(self.decision_function(X))
+        if self.kind == 'naive_bayes':
+            return self.arrays['classes'][np.argmax(scores, axis=1)]
+        if 'classes' in self.arrays:
+            return self._classify(scores)
+        return scores.ravel() if np.ndim(self.arrays['coef']) == 1 or scores.shape[1] == 1 else scores
+
+def _dense(X):
+    return X.toarray() if hasattr(X, 'toarray') else np.asarray(X)
+
+def load_model(model_dir=None, pickle_file=None):
+    # the compact copy when it exists, otherwise the pickle
+    if model_dir and os.path.exists(os.path.join(model_dir, META_FILE)):
+        return CompactModel(model_dir)
+    import pickle
+    with open(pickle_file, 'rb') as f:
+        return pickle.load(f)
+
+# run in a fresh interpreter for the cold start benchmark
+_COLD_START = '''
+import sys, time, resource
+start = time.perf_counter()
+sys.path.insert(0, {here!r})
+if {compact}:
+    from compact_model import CompactModel
+    model = CompactModel({path!r})
+else:
+    import pickle
+    model = pickle.load(open({path!r}, 'rb'))
+import numpy as np
+model.predict(np.ones((1, {n_features})))
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+def _n_features(args_features, compact):
+    n = args_features or compact.params.get('n_features')
+    if n is None:
+        sys.exit('the model does not record its number of features, pass --features')
+    return n
+
+def main():
+    import pickle
+    import argparse
+    import subprocess
+    parser = argparse.ArgumentParser(description='export pickled scikit-learn models to the compact format')
+    parser.add_argument('command', choices=['export', 'check', 'benchmark'])
+    parser.add_argument('pickle_file')
+    parser.add_argument('model_dir', nargs='?', help='defaults to the pickle file name without .pkl')
+    parser.add_argument('--features', type=int, help='number of input features, if the model does not record it')
+    parser.add_argument('--rows', type=int, default=10000, help='random rows used by check')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts timed by benchmark')
+    args = parser.parse_args()
+    model_dir = args.model_dir or os.path.splitext(args.pickle_file)[0]
+
+    if args.command == 'export':
+        with open(args.pickle_file, 'rb') as f:
+            params = export(pickle.load(f), model_dir)
+        print('exported {} ({}) to {}'.format(params['model'], params['kind'], model_dir))
+    elif args.command == 'check':
+        with open(args.pickle_file, 'rb') as f:
+            model = pickle.load(f)
+        compact = CompactModel(model_dir)
+        X = np.random.default_rng(0).random((args.rows, _n_features(args.features, compact)))
+        expected, got = model.predict(X), compact.predict(X)
+        if np.issubdtype(np.asarray(expected).dtype, np.number):
+            same = np.isclose(expected, got, rtol=1e-9, atol=1e-9)
+        else:
+            same = np.asarray(expected).astype(str) == np.asarray(got).astype(str)
+        print('{} of {} predictions identical'.format(int(same.sum()), len(same)))
+        sys.exit(0 if same.all() else 1)
+    else:
+        compact = CompactModel(model_dir)
+        n_features = _n_features(args.features, compact)
+        here = os.path.dirname(os.path.abspath(__file__))
+        for label, path, is_compact in (('pickle', args.pickle_file, False), ('compact', model_dir, True)):
+            script = _COLD_START.format(here=here, compact=is_compact, path=os.path.abspath(path), n_features=n_features)
+            runs = [subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout.split()
+                    for _ in range(args.runs)]
+            seconds = sorted(float(r[0]) for r in runs)
+            # ru_maxrss is in kilobytes on Linux
+            rss = max(int(r[1]) for r in runs) / 1024
+            print('{:>8}: cold start {:.1f} ms (median of {}), peak RSS {:.1f} MB'.format(
+                label, seconds[len(seconds) // 2] * 1000, args.runs, rss))
+
+if __name__ == '__main__':
+    main()
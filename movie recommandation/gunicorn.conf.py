@@ -0,0 +1,10 @@
+import gc
+
+# build the model in the master process before forking, workers then share its memory copy-on-write
+preload_app = True
+workers = 4
+
+def pre_fork(server, worker):
+    # move everything allocated so far out of the garbage collector's reach, otherwise the
+    # first collection in each worker touches every object and un-shares the pages
+    gc.freeze()
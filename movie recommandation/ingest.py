@@ -0,0 +1,116 @@
+# add movies to main_data.csv and to the neighbour table without recomputing every pair
+#
+#   python ingest.py new_movies.csv      append the rows of new_movies.csv (same columns as main_data.csv)
+#   python ingest.py --compact           full rebuild, also picks up words the frozen vocabulary misses
+import os
+import json
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from neighbour_index import (INDEX_DIR, IDS_FILE, SCORES_FILE, TITLES_FILE, VECTORIZER_FILE, ROWS_FILE,
+                             META_FILE, build_index, save_index, save_state, top_k_rows)
+
+def load_state(index_dir=INDEX_DIR):
+    # plain (not memory mapped) copies, the files are replaced rather than modified in place
+    state = {
+        'ids': np.load(os.path.join(index_dir, IDS_FILE)),
+        'scores': np.load(os.path.join(index_dir, SCORES_FILE)),
+        'rows': sp.load_npz(os.path.join(index_dir, ROWS_FILE)).tocsr(),
+    }
+    with open(os.path.join(index_dir, TITLES_FILE)) as f:
+        state['titles'] = json.load(f)
+    with open(os.path.join(index_dir, VECTORIZER_FILE), 'rb') as f:
+        state['vectorizer'] = pickle.load(f)
+    with open(os.path.join(index_dir, META_FILE)) as f:
+        state['meta'] = json.load(f)
+    return state
+
+def add_rows(ids, scores, rows, new_rows, k):
+    # neighbours for the new rows plus updated neighbours of the existing ones, O(new x N)
+    n, m = rows.shape[0], new_rows.shape[0]
+    all_rows = sp.vstack([rows, new_rows]).tocsr()
+    block = (new_rows @ all_rows.T).toarray()
+    block[np.arange(m), n + np.arange(m)] = -np.inf
+    k = min(k, n + m - 1)
+    new_ids, new_scores = top_k_rows(block, k)
+    # an existing movie keeps its neighbours unless one of the new movies scores higher
+    candidate_ids = np.hstack([ids, np.broadcast_to(np.arange(n, n + m, dtype=np.int32), (n, m))])
+    candidate_scores = np.hstack([scores, block[:, :n].T])
+    old_ids, old_scores = top_k_rows(candidate_scores, k, columns=candidate_ids)
+    return np.vstack([old_ids, new_ids]), np.vstack([old_scores, new_scores]), all_rows
+
+def in_step(state, csv_path):
+    # False when an earlier ingest stopped half way: the csv, the table and the rows disagree
+    titles = list(pd.read_csv(csv_path, usecols=['movie_title'])['movie_title'])
+    return (state['titles'] == titles and state['rows'].shape[0] == len(titles)
+            and state['ids'].shape[0] == len(titles))
+
+def append_csv(new_data, csv_path):
+    # appends to a copy and renames it over the original, readers never see a partial row
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(csv_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f, open(csv_path) as original:
+            shutil.copyfileobj(original, f)
+            new_data.to_csv(f, header=False, index=False)
+        os.replace(tmp, csv_path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def ingest(new_data, csv_path='main_data.csv', index_dir=INDEX_DIR, block_size=1024, compact_ratio=0.2):
+    state = load_state(index_dir)
+    if not in_step(state, csv_path):
+        compact(csv_path, index_dir)
+        state = load_state(index_dir)
+    meta = state['meta']
+    # a catalogue smaller than k has fewer neighbours per movie than meta['k']
+    k = min(meta['k'], state['ids'].shape[1])
+    new_data = new_data.copy()
+    new_data['movie_title'] = new_data['movie_title'].str.lower()
+    # keep the column order of the csv we append to
+    new_data = new_data.reindex(columns=pd.read_csv(csv_path, nrows=0).columns)
+
+    ids, scores, rows = state['ids'], state['scores'], state['rows']
+    for start in range(0, len(new_data), block_size):
+        texts = new_data['comb'].iloc[start:start + block_size]
+        # frozen vocabulary: words the vectorizer has never seen are ignored until the next compaction
+        new_rows = normalize(state['vectorizer'].transform(texts).astype(np.float32)).tocsr()
+        ids, scores, rows = add_rows(ids, scores, rows, new_rows, k)
+
+    # every file is replaced atomically, in this order: csv, neighbour table, state. A crash in
+    # between leaves the csv ahead of the rest, which in_step() notices on the next run; until
+    # then the registry finds no matching table and computes the neighbours itself
+    append_csv(new_data, csv_path)
+    save_index(ids, scores, state['titles'] + list(new_data['movie_title']), index_dir)
+    meta['ingested'] += len(new_data)
+    save_state(state['vectorizer'], rows, meta, index_dir)
+
+    if meta['ingested'] > compact_ratio * meta['built']:
+        compact(csv_path, index_dir)
+    return len(new_data)
+
+def compact(csv_path='main_data.csv', index_dir=INDEX_DIR):
+    # full rebuild: refits the vocabulary and recomputes every pair
+    with open(os.path.join(index_dir, META_FILE)) as f:
+        meta = json.load(f)
+    return build_index(csv_path, index_dir, k=meta['k'], engine=meta['engine'])
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='add movies to the catalogue and the neighbour table')
+    parser.add_argument('new', nargs='?', help='csv with the new movies')
+    parser.add_argument('--csv', default='main_data.csv')
+    parser.add_argument('--index', default=INDEX_DIR)
+    parser.add_argument('--compact', action='store_true', help='rebuild the whole table')
+    args = parser.parse_args()
+    if args.compact:
+        compact(args.csv, args.index)
+        print('rebuilt', args.index)
+    elif args.new:
+        print('added {} movies'.format(ingest(pd.read_csv(args.new), args.csv, args.index)))
+    else:
+        parser.error('give a csv of new movies or --compact')
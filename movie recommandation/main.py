@@ -1,66 +1,68 @@
-import numpy as np
-import pandas as pd
-from flask import Flask, render_template, request
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import json
-import bs4 as bs
-import urllib.request
+from flask import Flask, render_template, request, jsonify, make_response, url_for
+import os
 import pickle
-import requests
-
-# load the nlp model and tfidf vectorizer from disk
+from registry import ModelRegistry
+from titles import TitleIndex
+from sentiment import SentimentScorer
+from reviews import ReviewFetcher, IMDB_ID
+from page_cache import PageCache, payload_key, PAGE_KEY
+from compact_model import load_model
+from microbatch import MicroBatcher
+from payload import PayloadError, parse_recommend_payload, build_cards
+
+# load the nlp model and tfidf vectorizer from disk, the model from its compact copy
+# (python compact_model.py export nlp_model.pkl nlp_model) when there is one
 filename = 'nlp_model.pkl'
-clf = pickle.load(open(filename, 'rb'))
+clf = load_model('nlp_model', filename)
 vectorizer = pickle.load(open('tranform.pkl','rb'))
 
-def create_similarity():
-    data = pd.read_csv('main_data.csv')
-    # creating a count matrix
-    cv = CountVectorizer()
-    count_matrix = cv.fit_transform(data['comb'])
-    # creating a similarity score matrix
-    similarity = cosine_similarity(count_matrix)
-    return data,similarity
+# batched, cached review scoring: score_reviews(["review", ...]) -> ["Good", "Bad", ...]
+# the classifier sits behind a micro-batcher so concurrent pages share one predict call
+batcher = MicroBatcher(clf.predict)
+scorer = SentimentScorer(vectorizer, batcher)
+score_reviews = scorer.score_reviews
+
+# pooled, cached IMDB review fetcher shared by all requests
+fetcher = ReviewFetcher()
+
+# rendered recommend pages, they expire with the reviews they show and are dropped when the
+# reviews of a movie are fetched again; set PAGE_CACHE_DIR to keep them on disk as well
+page_cache = PageCache(ttl=fetcher.ttl, disk_dir=os.environ.get('PAGE_CACHE_DIR'))
+fetcher.on_refresh(page_cache.invalidate)
+
+# titles and neighbour table are loaded once per process and reloaded in the background when
+# main_data.csv changes; loading at import time lets gunicorn --preload share them between workers
+registry = ModelRegistry()
+
+# autocomplete index, rebuilt together with the model whenever the dataset changes
+title_index = TitleIndex([])
+def rebuild_title_index(model):
+    global title_index
+    title_index = TitleIndex(model.titles)
+registry.on_reload(rebuild_title_index)
+registry.preload()
 
 def rcmd(m):
     m = m.lower()
-    try:
-        data.head()
-        similarity.shape
-    except:
-        data, similarity = create_similarity()
-    if m not in data['movie_title'].unique():
+    l = registry.get().neighbours(m)
+    if l is None:
         return('Sorry! The movie that you have requested is not in our database. Please check the spelling or try with some other movies')
-    else:
-        i = data.loc[data['movie_title']==m].index[0]
-        lst = list(enumerate(similarity[i]))
-        lst = sorted(lst, key = lambda x:x[1] ,reverse=True)
-        lst = lst[1:11] # excluding first item since it is the requested movie itself
-        l = []
-        for i in range(len(lst)):
-            a = lst[i][0]
-            l.append(data['movie_title'][a])
-        return l
+    return l
     
-# converting list of string to list (eg. "["abc","def"]" to ["abc","def"])
-def convert_to_list(my_list):
-    my_list = my_list.split('","')
-    my_list[0] = my_list[0].replace('["','')
-    my_list[-1] = my_list[-1].replace('"]','')
-    return my_list
-
-def get_suggestions():
-    data = pd.read_csv('main_data.csv')
-    return list(data['movie_title'].str.capitalize())
-
 app = Flask(__name__)
 
 @app.route("/")
 @app.route("/home")
 def home():
-    suggestions = get_suggestions()
-    return render_template('home.html',suggestions=suggestions)
+    # suggestions are fetched from /suggest as the user types instead of embedding the whole catalogue
+    return render_template('home.html')
+
+@app.route("/suggest")
+def suggest():
+    q = request.args.get('q', '')
+    n = min(request.args.get('n', 10, type=int), 50)
+    registry.get()
+    return jsonify(title_index.suggest(q, n))
 
 @app.route("/similarity",methods=["POST"])
 def similarity():
@@ -74,79 +76,75 @@ def similarity():
 
 @app.route("/recommend",methods=["POST"])
 def recommend():
-    # getting data from AJAX request
-    title = request.form['title']
-    cast_ids = request.form['cast_ids']
-    cast_names = request.form['cast_names']
-    cast_chars = request.form['cast_chars']
-    cast_bdays = request.form['cast_bdays']
-    cast_bios = request.form['cast_bios']
-    cast_places = request.form['cast_places']
-    cast_profiles = request.form['cast_profiles']
-    imdb_id = request.form['imdb_id']
-    poster = request.form['poster']
-    genres = request.form['genres']
-    overview = request.form['overview']
-    vote_average = request.form['rating']
-    vote_count = request.form['vote_count']
-    release_date = request.form['release_date']
-    runtime = request.form['runtime']
-    status = request.form['status']
-    rec_movies = request.form['rec_movies']
-    rec_posters = request.form['rec_posters']
-
-    # get movie suggestions for auto complete
-    suggestions = get_suggestions()
-
-    # call the convert_to_list function for every string that needs to be converted to list
-    rec_movies = convert_to_list(rec_movies)
-    rec_posters = convert_to_list(rec_posters)
-    cast_names = convert_to_list(cast_names)
-    cast_chars = convert_to_list(cast_chars)
-    cast_profiles = convert_to_list(cast_profiles)
-    cast_bdays = convert_to_list(cast_bdays)
-    cast_bios = convert_to_list(cast_bios)
-    cast_places = convert_to_list(cast_places)
-    
-    # convert string to list (eg. "[1,2,3]" to [1,2,3])
-    cast_ids = cast_ids.split(',')
-    cast_ids[0] = cast_ids[0].replace("[","")
-    cast_ids[-1] = cast_ids[-1].replace("]","")
-    
-    # rendering the string to python string
-    for i in range(len(cast_bios)):
-        cast_bios[i] = cast_bios[i].replace(r'\n', '\n').replace(r'\"','\"')
-    
+    # getting data from AJAX request, either a JSON body or the old form fields
+    try:
+        payload = parse_recommend_payload(request)
+    except PayloadError as e:
+        return str(e), 400
+    title = payload['title']
+    imdb_id = str(payload['imdb_id'])
+    poster = payload['poster']
+    genres = payload['genres']
+    overview = payload['overview']
+    vote_average = payload['rating']
+    vote_count = payload['vote_count']
+    release_date = payload['release_date']
+    runtime = payload['runtime']
+    status = payload['status']
+
+    # repeat views of a movie skip scraping, scoring and templating
+    key = payload_key(imdb_id, payload) if IMDB_ID.match(imdb_id) else None
+    cached = page_cache.get(key) if key else None
+    if cached is not None:
+        return page_response(key, *cached)
+
     # combining multiple lists as a dictionary which can be passed to the html file so that it can be processed easily and the order of information will be preserved
-    movie_cards = {rec_posters[i]: rec_movies[i] for i in range(len(rec_posters))}
-    
-    casts = {cast_names[i]:[cast_ids[i], cast_chars[i], cast_profiles[i]] for i in range(len(cast_profiles))}
-
-    cast_details = {cast_names[i]:[cast_ids[i], cast_profiles[i], cast_bdays[i], cast_places[i], cast_bios[i]] for i in range(len(cast_places))}
-
-    # web scraping to get user reviews from IMDB site
-    sauce = urllib.request.urlopen('https://www.imdb.com/title/{}/reviews?ref_=tt_ov_rt'.format(imdb_id)).read()
-    soup = bs.BeautifulSoup(sauce,'lxml')
-    soup_result = soup.find_all("div",{"class":"text show-more__control"})
-
-    reviews_list = [] # list of reviews
-    reviews_status = [] # list of comments (good or bad)
-    for reviews in soup_result:
-        if reviews.string:
-            reviews_list.append(reviews.string)
-            # passing the review to our model
-            movie_review_list = np.array([reviews.string])
-            movie_vector = vectorizer.transform(movie_review_list)
-            pred = clf.predict(movie_vector)
-            reviews_status.append('Good' if pred else 'Bad')
+    movie_cards, casts, cast_details = build_cards(payload)
+
+    # user reviews from the IMDB site, served from the review cache when possible
+    try:
+        reviews_list = fetcher.get_reviews(imdb_id) # list of reviews
+    except ValueError:
+        reviews_list = []
+
+    # score the whole page with one transform/predict call
+    reviews_status = score_reviews(reviews_list) # list of comments (good or bad)
 
     # combining reviews and comments into a dictionary
     movie_reviews = {reviews_list[i]: reviews_status[i] for i in range(len(reviews_list))}     
 
     # passing all the data to the html file
-    return render_template('recommend.html',title=title,poster=poster,overview=overview,vote_average=vote_average,
+    body = render_template('recommend.html',title=title,poster=poster,overview=overview,vote_average=vote_average,
         vote_count=vote_count,release_date=release_date,runtime=runtime,status=status,genres=genres,
         movie_cards=movie_cards,reviews=movie_reviews,casts=casts,cast_details=cast_details)
+    if key:
+        return page_response(key, body, page_cache.put(key, body, expires=fetcher.expires(imdb_id)))
+    return body
+
+@app.route("/recommend/<key>")
+def recommend_page(key):
+    # a page rendered by POST /recommend, at the address given in its Content-Location header;
+    # 404 once it has expired, the client then posts the movie again
+    cached = page_cache.get(key) if PAGE_KEY.match(key) else None
+    if cached is None:
+        return 'This page has expired, request the movie again', 404
+    return page_response(key, *cached)
+
+def page_response(key, body, etag):
+    # clients that already have this version of the page get an empty 304; conditional requests
+    # only apply to GET and HEAD on /recommend/<key>, a POST always gets the page
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Content-Location'] = url_for('recommend_page', key=key)
+    return response
+
+@app.route("/metrics")
+def metrics():
+    # queue depth and batch sizes of the sentiment batcher
+    return jsonify(batcher.stats())
 
 if __name__ == '__main__':
     app.run(debug=True)
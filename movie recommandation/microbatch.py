@@ -0,0 +1,136 @@
+# Micro-batching for model inference: concurrent requests put their rows on a queue, one
+# background thread collects them for at most `max_wait` seconds or `max_batch` rows and runs a
+# single vectorised predict, then hands every request its own slice of the result. When the
+# batched call fails every request is run on its own, so only the one with bad rows gets the error.
+#
+#   batcher = MicroBatcher(model.predict)
+#   batcher.predict(X)      # drop-in for model.predict(X), safe to call from many threads
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+def _as_rows(X):
+    # X as a 2-d array of rows (sparse matrices are kept as they are), ValueError otherwise
+    if not hasattr(X, 'tocsr'):
+        X = np.asarray(X)
+        if X.dtype == object:
+            raise ValueError('expected numeric rows, got {} values'.format(X.dtype))
+    if X.ndim != 2:
+        raise ValueError('expected a 2-d array of rows, got shape {}'.format(X.shape))
+    return X
+
+def _stack(parts):
+    if hasattr(parts[0], 'tocsr'):
+        import scipy.sparse as sp
+        return sp.vstack(parts).tocsr()
+    return np.vstack([np.asarray(p) for p in parts])
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch=256, max_wait=0.002):
+        self._predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        # metrics, updated by the worker and read by stats() from request threads
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_worker(self):
+        # the thread is started on first use in every process, a gunicorn worker forked from a
+        # preloaded master does not inherit the master's thread
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, daemon=True, name='microbatch').start()
+                    self._pid = os.getpid()
+
+    def submit(self, X):
+        # Future with the predictions for the rows of X, raises ValueError for anything but rows
+        X = _as_rows(X)
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((X, future))
+        return future
+
+    def predict(self, X):
+        return self.submit(X).result()
+
+    def _collect(self, batch):
+        # fills batch with (X, future) pairs, returns the number of rows
+        batch.append(self._queue.get())
+        rows = batch[0][0].shape[0]
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += item[0].shape[0]
+        return rows
+
+    def _timed_predict(self, X):
+        start = time.perf_counter()
+        try:
+            return self._predict(X)
+        finally:
+            with self._stats_lock:
+                self.busy_seconds += time.perf_counter() - start
+
+    def _record(self, rows):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += rows
+            self.max_batch_seen = max(self.max_batch_seen, rows)
+
+    def _run_alone(self, X, future):
+        try:
+            future.set_result(self._timed_predict(X))
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self._record(X.shape[0])
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                rows = self._collect(batch)
+                predictions = self._timed_predict(_stack([X for X, _ in batch]))
+            except Exception:
+                # one request's rows can fail the whole call, retry them one by one so the
+                # others still get their predictions
+                for X, future in batch:
+                    self._run_alone(X, future)
+                continue
+            self._record(rows)
+            offset = 0
+            for X, future in batch:
+                n = X.shape[0]
+                future.set_result(predictions[offset:offset + n])
+                offset += n
+
+    def stats(self):
+        with self._stats_lock:
+            batches, items = self.batches, self.items
+            max_batch_seen, busy_seconds = self.max_batch_seen, self.busy_seconds
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'items': items,
+            'mean_batch_size': round(items / batches, 2) if batches else 0,
+            'max_batch_size': max_batch_seen,
+            'busy_seconds': round(busy_seconds, 3),
+        }
@@ -0,0 +1,127 @@
+import os
+import json
+import pickle
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+# files written by the offline build step, next to main_data.csv
+INDEX_DIR = 'neighbour_index'
+IDS_FILE = 'neighbour_ids.npy'
+SCORES_FILE = 'neighbour_scores.npy'
+TITLES_FILE = 'titles.json'
+# what ingest.py needs to add movies without a full rebuild
+VECTORIZER_FILE = 'vectorizer.pkl'
+ROWS_FILE = 'rows.npz'
+META_FILE = 'meta.json'
+
+def top_k_neighbours(count_matrix, k=10, block_size=1024):
+    # cosine similarity is the dot product of l2 normalised rows, so we only ever
+    # hold a (block_size x N) slice of the similarity matrix in memory
+    rows = normalize(count_matrix.astype(np.float32), norm='l2', copy=True).tocsr()
+    n = rows.shape[0]
+    k = min(k, n - 1)
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = (rows[start:stop] @ rows.T).toarray()
+        # a movie is never its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        ids[start:stop], scores[start:stop] = top_k_rows(block, k)
+    return ids, scores
+
+def top_k_rows(block, k, columns=None):
+    # k best columns of every row of a dense score block, best first; `columns` maps block
+    # columns to movie ids when they are not simply 0..width-1
+    # argpartition picks the k best in O(width), only those k get sorted
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    part = np.take_along_axis(part, order, axis=1)
+    if columns is not None:
+        part = np.take_along_axis(columns, part, axis=1) if columns.ndim == 2 else columns[part]
+    return part.astype(np.int32), np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+
+def save_index(ids, scores, titles, index_dir=INDEX_DIR):
+    os.makedirs(index_dir, exist_ok=True)
+    # write to temporary names first so a running server never sees half a file
+    for name, array in ((IDS_FILE, ids), (SCORES_FILE, scores)):
+        tmp = os.path.join(index_dir, name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(index_dir, name))
+    tmp = os.path.join(index_dir, TITLES_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(list(titles), f)
+    os.replace(tmp, os.path.join(index_dir, TITLES_FILE))
+
+def save_state(vectorizer, rows, meta, index_dir=INDEX_DIR):
+    # the fitted vectorizer (frozen vocabulary) and the normalised rows of every movie
+    tmp = os.path.join(index_dir, VECTORIZER_FILE + '.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(vectorizer, f)
+    os.replace(tmp, os.path.join(index_dir, VECTORIZER_FILE))
+    tmp = os.path.join(index_dir, 'rows.tmp.npz')
+    sp.save_npz(tmp, rows.tocsr())
+    os.replace(tmp, os.path.join(index_dir, ROWS_FILE))
+    tmp = os.path.join(index_dir, META_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(index_dir, META_FILE))
+
+def build_index(csv_path='main_data.csv', index_dir=INDEX_DIR, k=10, engine='count'):
+    from similarity import create_engine
+    data = pd.read_csv(csv_path)
+    similarity = create_engine(engine).fit(data['comb'])
+    ids, scores = similarity.neighbours(k)
+    save_index(ids, scores, data['movie_title'], index_dir)
+    rows = normalize(similarity.matrix.astype(np.float32)).tocsr()
+    # the requested k, the table is narrower while the catalogue has k movies or fewer
+    save_state(similarity.vectorizer, rows, {'engine': engine, 'k': k, 'built': len(data), 'ingested': 0}, index_dir)
+    return ids, scores
+
+class NeighbourIndex:
+    # read only view of the neighbour table; opened from disk the arrays are memory mapped so
+    # the pages are shared between every process that opens the same files
+    def __init__(self, ids, scores, titles):
+        self.ids = ids
+        self.scores = scores
+        self.titles = list(titles)
+        self.positions = {}
+        for i, title in enumerate(self.titles):
+            self.positions.setdefault(title, i)
+
+    @classmethod
+    def open(cls, index_dir=INDEX_DIR):
+        ids = np.load(os.path.join(index_dir, IDS_FILE), mmap_mode='r')
+        scores = np.load(os.path.join(index_dir, SCORES_FILE), mmap_mode='r')
+        with open(os.path.join(index_dir, TITLES_FILE)) as f:
+            titles = json.load(f)
+        return cls(ids, scores, titles)
+
+    @classmethod
+    def exists(cls, index_dir=INDEX_DIR):
+        return all(os.path.exists(os.path.join(index_dir, name)) for name in (IDS_FILE, SCORES_FILE, TITLES_FILE))
+
+    def __contains__(self, title):
+        return title in self.positions
+
+    def neighbours(self, title, n=10):
+        i = self.positions.get(title)
+        if i is None:
+            return None
+        # approximate engines may find fewer than k neighbours, the gaps have score -inf
+        return [self.titles[j] for j, score in zip(self.ids[i, :n], self.scores[i, :n]) if score > -np.inf]
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='build the top-K neighbour table used by /similarity')
+    parser.add_argument('--csv', default='main_data.csv')
+    parser.add_argument('--out', default=INDEX_DIR)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--engine', default='count', help='similarity engine, see similarity.ENGINES')
+    args = parser.parse_args()
+    ids, scores = build_index(args.csv, args.out, args.k, args.engine)
+    print('wrote {} x {} neighbours to {}'.format(ids.shape[0], ids.shape[1], args.out))
@@ -0,0 +1,98 @@
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# keys made by payload_key(), the only ones that may name a file in the disk tier
+PAGE_KEY = re.compile(r'^tt\d+-[0-9a-f]{40}$')
+
+def payload_key(imdb_id, payload):
+    # same movie and same posted data -> same page
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    return '{}-{}'.format(imdb_id, digest)
+
+class PageCache:
+    # rendered recommend.html pages: a bounded in-memory LRU with an optional directory as a second
+    # tier; entries expire at the time given to put() (`ttl` seconds by default) and can be dropped
+    # per movie when its reviews change
+    def __init__(self, maxsize=512, ttl=6 * 3600, disk_dir=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.json')
+
+    def get(self, key):
+        # returns (body, etag) or None
+        now = time.time()
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                if now < entry[2]:
+                    self._pages.move_to_end(key)
+                    return entry[0], entry[1]
+                del self._pages[key]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key)) as f:
+                    body, etag, expires = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if now < expires:
+                self._remember(key, (body, etag, expires))
+                return body, etag
+        return None
+
+    def put(self, key, body, expires=None):
+        # expires is a time.time() value, eg. when the reviews the page shows go stale
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        if expires is None:
+            expires = time.time() + self.ttl
+        entry = (body, etag, expires)
+        self._remember(key, entry)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp = '{}.{}.tmp'.format(path, threading.get_ident())
+            with open(tmp, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        return etag
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._pages[key] = entry
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+
+    def invalidate(self, imdb_id):
+        # drop every page of one movie, eg. when its reviews were refreshed
+        prefix = imdb_id + '-'
+        with self._lock:
+            for key in [key for key in self._pages if key.startswith(prefix)]:
+                del self._pages[key]
+        if self.disk_dir:
+            for path in glob.glob(os.path.join(glob.escape(self.disk_dir), glob.escape(prefix) + '*.json')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+        if self.disk_dir:
+            for path in glob.glob(os.path.join(glob.escape(self.disk_dir), '*.json')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,80 @@
+import json
+
+# fields of the /recommend request
+SCALAR_FIELDS = ('title', 'imdb_id', 'poster', 'genres', 'overview', 'rating', 'vote_count',
+                 'release_date', 'runtime', 'status')
+CAST_FIELDS = ('cast_ids', 'cast_names', 'cast_chars', 'cast_profiles', 'cast_bdays', 'cast_bios', 'cast_places')
+MOVIE_FIELDS = ('rec_movies', 'rec_posters')
+
+class PayloadError(ValueError):
+    pass
+
+# converting list of string to list (eg. "["abc","def"]" to ["abc","def"])
+def convert_to_list(my_list):
+    my_list = my_list.split('","')
+    my_list[0] = my_list[0].replace('["','')
+    my_list[-1] = my_list[-1].replace('"]','')
+    return my_list
+
+def _legacy_list(value):
+    # the old page posts every list as a JSON.stringify'ed string, parse it as JSON and only fall
+    # back to the string surgery for values that are not valid JSON
+    try:
+        parsed = json.loads(value)
+        if isinstance(parsed, list):
+            return parsed
+    except ValueError:
+        pass
+    if value.startswith('[') and not value.startswith('["'):
+        # numbers, eg. "[1,2,3]"
+        return value.strip('[]').split(',')
+    return [item.replace(r'\n', '\n').replace(r'\"', '\"') for item in convert_to_list(value)]
+
+def from_form(form):
+    # compatibility shim for the old form encoded request
+    try:
+        payload = {field: form[field] for field in SCALAR_FIELDS}
+        for field in CAST_FIELDS + MOVIE_FIELDS:
+            payload[field] = _legacy_list(form[field])
+    except KeyError as e:
+        raise PayloadError('missing field {}'.format(e))
+    return payload
+
+def validate(payload):
+    if not isinstance(payload, dict):
+        raise PayloadError('expected a JSON object')
+    for field in SCALAR_FIELDS:
+        value = payload.get(field)
+        if value is None:
+            raise PayloadError('missing field {!r}'.format(field))
+        if not isinstance(value, (str, int, float)):
+            raise PayloadError('field {!r} must be a string or number'.format(field))
+    for fields in (CAST_FIELDS, MOVIE_FIELDS):
+        length = None
+        for field in fields:
+            value = payload.get(field)
+            if not isinstance(value, list):
+                raise PayloadError('field {!r} must be a list'.format(field))
+            if length is None:
+                length = len(value)
+            elif len(value) != length:
+                raise PayloadError('{} must all have the same length'.format(', '.join(fields)))
+    return payload
+
+def parse_recommend_payload(request):
+    # a JSON body is parsed once by Flask; form posts go through the shim
+    if request.is_json:
+        payload = request.get_json(silent=True)
+    else:
+        payload = from_form(request.form)
+    return validate(payload)
+
+def build_cards(payload):
+    # one pass over each group of parallel lists, in the order the page sent them
+    movie_cards = dict(zip(payload['rec_posters'], payload['rec_movies']))
+    casts = {}
+    cast_details = {}
+    for cast_id, name, char, profile, bday, bio, place in zip(*(payload[f] for f in CAST_FIELDS)):
+        casts[name] = [cast_id, char, profile]
+        cast_details[name] = [cast_id, profile, bday, place, bio]
+    return movie_cards, casts, cast_details
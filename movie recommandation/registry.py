@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+import pandas as pd
+from neighbour_index import INDEX_DIR, TITLES_FILE, NeighbourIndex
+from similarity import create_engine
+
+# exact 'count' reproduces the original recommendations, see similarity.ENGINES for the others
+SIMILARITY_ENGINE = os.environ.get('SIMILARITY_ENGINE', 'count')
+
+class Model(NeighbourIndex):
+    # everything /similarity needs, built once and never modified afterwards so it
+    # can be shared read-only between threads and (after fork) between workers;
+    # only the titles and the (usually memory mapped) neighbour arrays are kept
+    def __init__(self, titles, ids, scores, version):
+        super().__init__(ids, scores, titles)
+        self.version = version
+
+def data_version(csv_path, index_dir):
+    # modification times of the csv and of the neighbour table, a new table (ingest writes it
+    # after the csv) is picked up as well
+    try:
+        index_mtime = os.path.getmtime(os.path.join(index_dir, TITLES_FILE))
+    except OSError:
+        index_mtime = None
+    return os.path.getmtime(csv_path), index_mtime
+
+def load_model(csv_path='main_data.csv', index_dir=INDEX_DIR, k=10, engine=SIMILARITY_ENGINE):
+    version = data_version(csv_path, index_dir)
+    data = pd.read_csv(csv_path, usecols=['movie_title', 'comb'])
+    titles = list(data['movie_title'])
+    index = NeighbourIndex.open(index_dir) if NeighbourIndex.exists(index_dir) else None
+    if index is not None and index.titles == titles:
+        # the offline table (built or ingested) matches the data, reuse its memory mapped arrays
+        ids, scores = index.ids, index.scores
+    else:
+        # no usable table, the only case that needs the vectorizer and the full fit
+        ids, scores = create_engine(engine).fit(data['comb']).neighbours(k)
+    return Model(titles, ids, scores, version)
+
+class ModelRegistry:
+    # process wide holder of the current Model, reloaded when main_data.csv or the table changes on disk
+    def __init__(self, csv_path='main_data.csv', index_dir=INDEX_DIR, check_interval=5.0, loader=load_model):
+        self.csv_path = csv_path
+        self.index_dir = index_dir
+        self.check_interval = check_interval
+        self.loader = loader
+        self._model = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._listeners = []
+
+    def on_reload(self, callback):
+        # callback(model) runs after every (re)load, used for structures derived from the model
+        self._listeners.append(callback)
+
+    def _load(self):
+        model = self.loader(self.csv_path, self.index_dir)
+        for callback in self._listeners:
+            callback(model)
+        # a single reference assignment, readers see either the old or the new model
+        self._model = model
+        return model
+
+    def _reload(self):
+        # runs in a background thread, requests keep getting the current model meanwhile
+        try:
+            self._load()
+        except Exception:
+            # e.g. the csv is half written; the version still differs, so the next check retries
+            pass
+        finally:
+            self._reloading = False
+
+    def get(self):
+        model = self._model
+        now = time.monotonic()
+        if model is not None and now - self._checked < self.check_interval:
+            return model
+        with self._lock:
+            model = self._model
+            if model is None:
+                # nothing to serve yet, the first load has to block
+                model = self._load()
+            elif now - self._checked >= self.check_interval and not self._reloading:
+                try:
+                    changed = data_version(self.csv_path, self.index_dir) != model.version
+                except OSError:
+                    # file is being replaced, keep serving the current model
+                    changed = False
+                if changed:
+                    self._reloading = True
+                    threading.Thread(target=self._reload, daemon=True, name='model-reload').start()
+            self._checked = now
+        return model
+
+    def preload(self):
+        # call at import time so that gunicorn --preload builds the model once in the master
+        # and the workers share its pages copy-on-write
+        return self.get()
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import bs4 as bs
+import requests
+from requests.adapters import HTTPAdapter
+
+IMDB_BASE_URL = os.environ.get('IMDB_BASE_URL', 'https://www.imdb.com')
+REVIEWS_PATH = '/title/{}/reviews?ref_=tt_ov_rt'
+IMDB_ID = re.compile(r'^tt\d+$')
+
+logger = logging.getLogger(__name__)
+
+def parse_reviews(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    soup_result = soup.find_all("div", {"class": "text show-more__control"})
+    return [str(reviews.string) for reviews in soup_result if reviews.string]
+
+class ReviewFetcher:
+    # fetches and parses IMDB user reviews over a shared keep-alive session, keeps the parsed
+    # reviews on disk for `ttl` seconds and lets concurrent requests for one title share a fetch;
+    # failed fetches are remembered for `failure_ttl` seconds so an outage costs one timeout
+    def __init__(self, cache_dir='review_cache', ttl=6 * 3600, timeout=5.0,
+                 base_url=IMDB_BASE_URL, pool_size=16, workers=8, failure_ttl=30):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._inflight = {}
+        # imdb id -> time.monotonic() until which its page is not asked for again
+        self._failed = {}
+        # the same for every title, after a timeout or connection error
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def on_refresh(self, callback):
+        # callback(imdb_id) runs whenever fresh reviews replace the cached ones
+        self._listeners.append(callback)
+
+    def _cache_path(self, imdb_id):
+        return os.path.join(self.cache_dir, imdb_id + '.json')
+
+    def _read_entry(self, imdb_id):
+        try:
+            with open(self._cache_path(imdb_id)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get('fetched'), (int, float)) \
+                or not isinstance(entry.get('reviews'), list):
+            return None
+        return entry
+
+    def _read_cache(self, imdb_id, allow_stale=False):
+        entry = self._read_entry(imdb_id)
+        if entry is None:
+            return None
+        if not allow_stale and time.time() - entry['fetched'] > self.ttl:
+            return None
+        return entry['reviews']
+
+    def _write_cache(self, imdb_id, reviews):
+        # the cache only saves work, a full disk or a read-only directory must not fail the page
+        path = self._cache_path(imdb_id)
+        tmp = '{}.{}.tmp'.format(path, threading.get_ident())
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'fetched': time.time(), 'reviews': reviews}, f)
+            os.replace(tmp, path)
+        except OSError:
+            logger.exception('could not cache the reviews of %s', imdb_id)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _fetch(self, imdb_id):
+        try:
+            response = self.session.get(self.base_url + REVIEWS_PATH.format(imdb_id), timeout=self.timeout)
+            response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout):
+            # IMDB is slow or down: no title waits for it again until failure_ttl has passed
+            with self._lock:
+                self._down_until = time.monotonic() + self.failure_ttl
+            return self._fallback(imdb_id)
+        except requests.RequestException:
+            # an error page for this title only
+            with self._lock:
+                self._failed[imdb_id] = time.monotonic() + self.failure_ttl
+            return self._fallback(imdb_id)
+        try:
+            reviews = parse_reviews(response.content)
+        except Exception:
+            # a page we cannot read is an error page for this title
+            logger.exception('could not parse the reviews of %s', imdb_id)
+            with self._lock:
+                self._failed[imdb_id] = time.monotonic() + self.failure_ttl
+            return self._fallback(imdb_id)
+        self._write_cache(imdb_id, reviews)
+        for callback in self._listeners:
+            try:
+                callback(imdb_id)
+            except Exception:
+                logger.exception('refresh callback failed for %s', imdb_id)
+        return reviews
+
+    def _fallback(self, imdb_id):
+        # an old answer is better than none
+        return self._read_cache(imdb_id, allow_stale=True) or []
+
+    def _failed_recently(self, imdb_id):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._down_until:
+                return True
+            until = self._failed.get(imdb_id)
+            if until is not None and now >= until:
+                del self._failed[imdb_id]
+                until = None
+            return until is not None
+
+    def fetch_async(self, imdb_id):
+        # returns a Future with the list of reviews; only one fetch per title is ever in flight
+        if not IMDB_ID.match(imdb_id):
+            raise ValueError('invalid imdb id: {!r}'.format(imdb_id))
+        cached = self._read_cache(imdb_id)
+        if cached is None and self._failed_recently(imdb_id):
+            cached = self._fallback(imdb_id)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._inflight.get(imdb_id)
+            created = future is None
+            if created:
+                future = self.executor.submit(self._fetch, imdb_id)
+                self._inflight[imdb_id] = future
+        if created:
+            # outside the lock, the callback runs right here if the fetch already finished
+            future.add_done_callback(lambda f: self._done(imdb_id, f))
+        return future
+
+    def _done(self, imdb_id, future):
+        with self._lock:
+            if self._inflight.get(imdb_id) is future:
+                del self._inflight[imdb_id]
+
+    def expires(self, imdb_id):
+        # time.time() at which the cached reviews of a title go stale; stale or missing reviews
+        # (IMDB was down) are only trusted until failure_ttl from now
+        entry = self._read_entry(imdb_id)
+        now = time.time()
+        if entry is not None and entry['fetched'] + self.ttl > now:
+            return entry['fetched'] + self.ttl
+        return now + self.failure_ttl
+
+    def get_reviews(self, imdb_id):
+        return self.fetch_async(imdb_id).result()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
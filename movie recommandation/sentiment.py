@@ -0,0 +1,47 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+def review_key(text):
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+class SentimentScorer:
+    # scores reviews with the pickled tfidf vectorizer and classifier, one transform/predict call
+    # per batch; results are kept in an LRU cache so reviews of popular titles are scored once
+    def __init__(self, vectorizer, clf, maxsize=50000):
+        self.vectorizer = vectorizer
+        self.clf = clf
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score_reviews(self, texts):
+        texts = list(texts)
+        keys = [review_key(t) for t in texts]
+        results = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                else:
+                    # the same review can appear twice in a page, score it once
+                    missing.setdefault(key, []).append(i)
+        if missing:
+            batch = [texts[positions[0]] for positions in missing.values()]
+            preds = self.clf.predict(self.vectorizer.transform(batch))
+            with self._lock:
+                for (key, positions), pred in zip(missing.items(), preds):
+                    status = 'Good' if pred else 'Bad'
+                    for i in positions:
+                        results[i] = status
+                    self._cache[key] = status
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,123 @@
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from neighbour_index import top_k_neighbours
+
+def make_vectorizer(weighting):
+    if weighting == 'count':
+        return CountVectorizer()
+    if weighting == 'tfidf':
+        return TfidfVectorizer()
+    raise ValueError('unknown weighting: {!r}'.format(weighting))
+
+def _best(scores, ids, k):
+    # k highest scores in descending order, scores and ids are parallel 1-d arrays
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[part], ids[part]
+    order = np.argsort(-scores, kind='stable')
+    return ids[order], scores[order]
+
+class DenseEngine:
+    # the original approach: full N x N cosine matrix over raw counts, kept as the reference
+    # results for benchmarks, do not use it on large catalogues
+    def __init__(self, weighting='count'):
+        self.vectorizer = make_vectorizer(weighting)
+
+    def fit(self, texts):
+        self.matrix = self.vectorizer.fit_transform(texts)
+        self.similarity = cosine_similarity(self.matrix)
+        return self
+
+    def query(self, i, k=10):
+        scores = self.similarity[i].astype(np.float32)
+        scores[i] = -np.inf
+        return _best(scores, np.arange(len(scores)), k)
+
+    def neighbours(self, k=10):
+        ids, scores = zip(*(self.query(i, k) for i in range(self.similarity.shape[0])))
+        return np.array(ids, dtype=np.int32), np.array(scores, dtype=np.float32)
+
+class ExactEngine:
+    # exact cosine neighbours from l2 normalised sparse rows, computed in row blocks
+    def __init__(self, weighting='count', block_size=1024):
+        self.vectorizer = make_vectorizer(weighting)
+        self.block_size = block_size
+
+    def fit(self, texts):
+        self.matrix = self.vectorizer.fit_transform(texts)
+        self.rows = normalize(self.matrix.astype(np.float32)).tocsr()
+        return self
+
+    def query(self, i, k=10):
+        scores = (self.rows[i] @ self.rows.T).toarray().ravel()
+        scores[i] = -np.inf
+        return _best(scores, np.arange(len(scores)), k)
+
+    def neighbours(self, k=10):
+        return top_k_neighbours(self.matrix, k=k, block_size=self.block_size)
+
+class LSHEngine:
+    # approximate neighbours with random projection (signed) hashing: every table hashes a row to
+    # the signs of n_bits random projections, rows sharing a bucket in any table become candidates
+    # and only the candidates are scored exactly
+    def __init__(self, weighting='tfidf', n_bits=12, n_tables=8, seed=0):
+        self.vectorizer = make_vectorizer(weighting)
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self.seed = seed
+
+    def fit(self, texts):
+        self.matrix = self.vectorizer.fit_transform(texts)
+        self.rows = normalize(self.matrix.astype(np.float32)).tocsr()
+        rng = np.random.default_rng(self.seed)
+        planes = rng.standard_normal((self.rows.shape[1], self.n_bits * self.n_tables)).astype(np.float32)
+        bits = (self.rows @ planes) > 0
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        # codes[t, i] is the bucket of row i in table t
+        self.codes = (bits.reshape(-1, self.n_tables, self.n_bits) * weights).sum(axis=2).T
+        self.buckets = []
+        for codes in self.codes:
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            ends = np.r_[starts[1:], len(order)]
+            self.buckets.append({int(sorted_codes[s]): order[s:e] for s, e in zip(starts, ends)})
+        return self
+
+    def candidates(self, i):
+        found = [buckets[int(codes[i])] for codes, buckets in zip(self.codes, self.buckets)]
+        found = np.unique(np.concatenate(found))
+        return found[found != i]
+
+    def query(self, i, k=10):
+        ids = self.candidates(i)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        scores = (self.rows[i] @ self.rows[ids].T).toarray().ravel()
+        return _best(scores, ids, k)
+
+    def neighbours(self, k=10):
+        n = self.rows.shape[0]
+        ids = np.zeros((n, k), dtype=np.int32)
+        # rows with fewer than k candidates are padded with score -inf
+        scores = np.full((n, k), -np.inf, dtype=np.float32)
+        for i in range(n):
+            found, found_scores = self.query(i, k)
+            ids[i, :len(found)] = found
+            scores[i, :len(found)] = found_scores
+        return ids, scores
+
+ENGINES = {
+    'dense': lambda: DenseEngine('count'),
+    'count': lambda: ExactEngine('count'),
+    'tfidf': lambda: ExactEngine('tfidf'),
+    'lsh': lambda: LSHEngine('tfidf'),
+}
+
+def create_engine(name='count'):
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError('unknown similarity engine {!r}, choose from {}'.format(name, ', '.join(ENGINES)))
@@ -0,0 +1,73 @@
+import difflib
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+# titles scored by difflib per fuzzy lookup, the ones sharing the most trigrams with the query
+FUZZY_CANDIDATES = 50
+
+def trigrams(text):
+    # padded so the start and end of a title count as well
+    text = '  {} '.format(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TitleIndex:
+    # sorted, case folded movie titles for autocomplete; prefix lookups are two binary searches
+    def __init__(self, titles):
+        pairs = sorted({(str(t).casefold(), str(t).capitalize()) for t in titles})
+        self.keys = [key for key, _ in pairs]
+        self.display = [name for _, name in pairs]
+        # trigram -> positions of the keys containing it, the candidate filter of fuzzy()
+        postings = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                postings[gram].append(i)
+        self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        # every key starting with prefix sorts before prefix + the highest code point
+        hi = bisect_left(self.keys, prefix + '\U0010ffff', lo)
+        return lo, hi
+
+    def prefix(self, q, n=10):
+        lo, hi = self._range(q.casefold())
+        return self.display[lo:min(hi, lo + n)]
+
+    def fuzzy(self, q, n=10, cutoff=0.6):
+        q = q.casefold()
+        if not q:
+            return []
+        # difflib's ratio is at most 2 * shorter / (len(a) + len(b)), so titles whose length is
+        # too far from the query's can never reach the cutoff
+        bound = cutoff / (2 - cutoff)
+        shortest, longest = len(q) * bound, len(q) / bound
+        # trigrams found in a large part of the catalogue ("the") say little and cost the most
+        lists = sorted((self.postings.get(gram, ()) for gram in trigrams(q)), key=len)
+        common = max(len(self.keys) // 20, 100)
+        shared = Counter()
+        for i, postings in enumerate(lists):
+            if i and len(postings) > common:
+                break
+            shared.update(postings)
+        candidates = [i for i, _ in shared.most_common()
+                      if shortest <= len(self.keys[i]) <= longest][:FUZZY_CANDIDATES]
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(q)
+        scored = []
+        for i in candidates:
+            matcher.set_seq1(self.keys[i])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    scored.append((-ratio, self.keys[i], i))
+        return [self.display[i] for _, _, i in sorted(scored)[:n]]
+
+    def suggest(self, q, n=10):
+        q = q.strip()
+        if not q:
+            return []
+        # close spellings only when nothing starts with q, the usual keystroke is a plain prefix lookup
+        return self.prefix(q, n) or self.fuzzy(q, n)